@@ -0,0 +1,320 @@
+# audio_catalog.py
+#
+# AI-Hub 원천데이터 음성 파일 목록을 sqlite에 저장해 두는 카탈로그.
+# 매번 os.walk로 전체 트리를 훑는 대신, 디렉터리 mtime이 바뀐 폴더만 다시 읽는다.
+# (파일이 추가 / 삭제 / 이름 변경되면 그 파일이 들어 있는 폴더의 mtime이 바뀜)
+#
+#   catalog = AudioCatalog()
+#   catalog.refresh(".../2.Validation/원천데이터_220125_add")
+#   paths = catalog.paths(domain="쇼핑", max_duration=120)
+#
+# 폴더 구조: <root>/<domain>/<category>/<file>.m4a  (예: 원천데이터/쇼핑/배송/쇼핑_8173.m4a)
+import os
+import time
+import sqlite3
+import threading
+
+DEFAULT_CATALOG_PATH = os.environ.get(
+    "AUDIO_CATALOG_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "callcenter_stt", "audio_catalog.sqlite3"),
+)
+
+AUDIO_EXTENSIONS = (".m4a", ".wav", ".mp3", ".flac")
+SPLIT_NAMES = ("Training", "Validation")
+PROBE_WORKERS = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    path        TEXT PRIMARY KEY,
+    refreshed   REAL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path        TEXT PRIMARY KEY,
+    parent      TEXT,
+    mtime_ns    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,
+    dir         TEXT NOT NULL,
+    root        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    duration    REAL,
+    split       TEXT,
+    domain      TEXT,
+    category    TEXT
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_domain ON files (domain, category);
+CREATE INDEX IF NOT EXISTS files_duration ON files (duration);
+"""
+
+
+def parse_layout(root: str, path: str) -> dict:
+    """경로에서 split(Training / Validation), domain, category를 뽑는다"""
+    rel_parts = os.path.relpath(path, root).split(os.sep)
+    split = None
+    for part in os.path.abspath(path).split(os.sep):
+        for name in SPLIT_NAMES:
+            if name in part:
+                split = name
+    return {
+        "split": split,
+        "domain": rel_parts[0] if len(rel_parts) > 1 else None,
+        "category": rel_parts[1] if len(rel_parts) > 2 else None,
+    }
+
+
+def _prefix_range(dir_path: str):
+    """dir_path 아래 경로 전부를 덮는 [lower, upper) 문자열 범위 ("/a/b" → "/a/b/" ~ "/a/b0")"""
+    lower = dir_path.rstrip(os.sep) + os.sep
+    upper = lower[:-1] + chr(ord(os.sep) + 1)
+    return lower, upper
+
+
+class AudioCatalog:
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        # with conn: 블록이 끝나면 commit (예외면 rollback)
+        return conn
+
+    def roots(self):
+        return [row["path"] for row in self._conn().execute("SELECT path FROM roots ORDER BY path")]
+
+    # ───────────────────────────────────────────────
+    # 갱신
+    # ───────────────────────────────────────────────
+    def refresh(self, root: str, full: bool = False) -> dict:
+        """
+        root 아래를 카탈로그에 반영. mtime이 그대로인 폴더는 파일 목록을 다시 읽지 않고
+        저장된 하위 폴더로만 내려간다. full=True면 모든 폴더를 다시 읽는다.
+        (같은 이름으로 내용만 덮어쓴 파일은 폴더 mtime이 안 바뀌므로 full=True로 잡아야 함)
+        """
+        root = os.path.abspath(root)
+        stats = {"dirs_checked": 0, "dirs_scanned": 0, "files_added": 0, "files_removed": 0}
+        start = time.perf_counter()
+
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO roots (path) VALUES (?)", (root,))
+
+        stack = [(root, None)]
+        while stack:
+            dir_path, parent = stack.pop()
+            try:
+                mtime_ns = os.stat(dir_path).st_mtime_ns
+            except FileNotFoundError:
+                self._remove_dir(dir_path, stats)
+                continue
+            stats["dirs_checked"] += 1
+
+            row = conn.execute("SELECT parent, mtime_ns FROM dirs WHERE path = ?", (dir_path,)).fetchone()
+            if row is not None and row["mtime_ns"] == mtime_ns and not full:
+                if parent is not None and row["parent"] != parent:
+                    # 안쪽 폴더를 root로 먼저 등록해 둔 경우 → 바깥 root에서 내려올 수 있게 부모를 이어 준다
+                    with conn:
+                        conn.execute("UPDATE dirs SET parent = ? WHERE path = ?", (parent, dir_path))
+                children = [r["path"] for r in conn.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,))]
+            else:
+                children = self._scan_dir(root, dir_path, parent, mtime_ns, stats)
+                stats["dirs_scanned"] += 1
+
+            stack.extend((child, dir_path) for child in children)
+
+        with conn:
+            conn.execute("UPDATE roots SET refreshed = ? WHERE path = ?", (time.time(), root))
+
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def _scan_dir(self, root, dir_path, parent, mtime_ns, stats):
+        """폴더 하나를 다시 읽어서 파일 / 하위 폴더 목록을 맞춘다. 하위 폴더 경로 리스트 반환"""
+        conn = self._conn()
+        children = []
+        found = {}
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    children.append(entry.path)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    found[entry.path] = entry.stat()
+
+        old_files = {
+            r["path"]: (r["size"], r["mtime_ns"])
+            for r in conn.execute("SELECT path, size, mtime_ns FROM files WHERE dir = ?", (dir_path,))
+        }
+        old_children = {r["path"] for r in conn.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,))}
+
+        with conn:
+            # 이미 카탈로그된 root 안쪽 폴더를 root로 refresh하면 parent가 None으로 들어온다
+            # → 기존 부모 링크는 지우지 않는다 (지우면 바깥 root refresh가 이 폴더로 안 내려감)
+            conn.execute(
+                "INSERT INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)"
+                " ON CONFLICT (path) DO UPDATE SET"
+                " mtime_ns = excluded.mtime_ns, parent = COALESCE(excluded.parent, dirs.parent)",
+                (dir_path, parent, mtime_ns),
+            )
+            for path, st in found.items():
+                if old_files.get(path) == (st.st_size, st.st_mtime_ns):
+                    continue
+                # 새 파일이거나 바뀐 파일 → duration은 다시 재야 하므로 NULL
+                layout = parse_layout(root, path)
+                conn.execute(
+                    "INSERT OR REPLACE INTO files"
+                    " (path, dir, root, size, mtime_ns, duration, split, domain, category)"
+                    " VALUES (?, ?, ?, ?, ?, NULL, ?, ?, ?)",
+                    (path, dir_path, root, st.st_size, st.st_mtime_ns,
+                     layout["split"], layout["domain"], layout["category"]),
+                )
+                stats["files_added"] += 1
+            for path in old_files.keys() - found.keys():
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                stats["files_removed"] += 1
+
+        for child in old_children - set(children):
+            self._remove_dir(child, stats)
+        return children
+
+    def _remove_dir(self, dir_path, stats):
+        """사라진 폴더와 그 아래 전부를 카탈로그에서 지운다"""
+        conn = self._conn()
+        lower, upper = _prefix_range(dir_path)
+        with conn:
+            # substr()로 비교하면 인덱스를 못 타므로 "dir_path/ 로 시작" 을 범위 조건으로 바꾼다
+            cur = conn.execute(
+                "DELETE FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)",
+                (dir_path, lower, upper),
+            )
+            stats["files_removed"] += cur.rowcount
+            conn.execute(
+                "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                (dir_path, lower, upper),
+            )
+
+    def fill_durations(self, limit: int = None, workers: int = PROBE_WORKERS) -> int:
+        """duration이 비어 있는 파일들을 ffprobe로 재서 채운다. 채운 개수 반환"""
+        from stt_infer import probe_durations
+
+        sql = "SELECT path FROM files WHERE duration IS NULL ORDER BY path"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        paths = [r["path"] for r in self._conn().execute(sql)]
+        if not paths:
+            return 0
+
+        durations = probe_durations(paths, workers)
+
+        conn = self._conn()
+        filled = 0
+        with conn:
+            for path, duration in zip(paths, durations):
+                if duration is not None:
+                    conn.execute("UPDATE files SET duration = ? WHERE path = ?", (duration, path))
+                    filled += 1
+        return filled
+
+    # ───────────────────────────────────────────────
+    # 조회
+    # ───────────────────────────────────────────────
+    def query(
+        self,
+        domain: str = None,
+        category: str = None,
+        split: str = None,
+        root: str = None,
+        min_duration: float = None,
+        max_duration: float = None,
+        limit: int = None,
+        order_by: str = "path",
+    ):
+        """
+        조건에 맞는 파일 row(dict) 리스트.
+        domain / category는 폴더 이름에 들어 있으면 맞는 것으로 본다 ("쇼핑" → "TS_쇼핑", "01.쇼핑"),
+        split / root는 정확히 같아야 한다.
+        min/max_duration을 주면 duration을 아직 안 잰 파일은 빠진다 (fill_durations 먼저).
+        order_by: "path" / "duration" / "-duration" / "size" / "-size"
+        """
+        where = []
+        params = []
+        for col, value in (("domain", domain), ("category", category)):
+            if value is not None:
+                # 부분 문자열 비교는 인덱스를 못 타므로, 폴더 이름 종류(몇십 개)를
+                # files_domain 인덱스에서 먼저 뽑아 맞는 이름만 IN으로 조회한다
+                names = self._matching_names(col, value)
+                if not names:
+                    return []
+                where.append(f"{col} IN ({','.join('?' * len(names))})")
+                params.extend(names)
+        if split is not None:
+            where.append("split = ?")
+            params.append(split)
+        if root is not None:
+            where.append("root = ?")
+            params.append(os.path.abspath(root))
+        if min_duration is not None:
+            where.append("duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            where.append("duration <= ?")
+            params.append(max_duration)
+
+        orders = {
+            "path": "path", "duration": "duration", "-duration": "duration DESC",
+            "size": "size", "-size": "size DESC",
+        }
+        if order_by not in orders:
+            raise ValueError(f"order_by는 {tuple(orders)} 중 하나여야 함: {order_by!r}")
+
+        sql = "SELECT * FROM files"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {orders[order_by]}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(r) for r in self._conn().execute(sql, params)]
+
+    def _matching_names(self, col: str, value: str):
+        """domain / category 값 중 value를 포함하는 것들"""
+        rows = self._conn().execute(f"SELECT DISTINCT {col} FROM files WHERE {col} IS NOT NULL")
+        return [r[0] for r in rows if value in r[0]]
+
+    def durations(self, paths) -> dict:
+        """경로 → 저장된 duration (카탈로그에 없거나 아직 안 잰 파일은 빠짐)"""
+        paths = [os.path.abspath(p) for p in paths]
+        found = {}
+        conn = self._conn()
+        # sqlite 변수 개수 제한 때문에 나눠서 조회
+        for start in range(0, len(paths), 500):
+            chunk = paths[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT path, duration FROM files WHERE duration IS NOT NULL AND path IN ({marks})", chunk
+            ):
+                found[row["path"]] = row["duration"]
+        return found
+
+    def paths(self, **filters):
+        """query()와 같은 조건으로 경로만 반환"""
+        return [row["path"] for row in self.query(**filters)]
+
+    def summary(self) -> dict:
+        """domain / category별 파일 수와 전체 길이"""
+        rows = self._conn().execute(
+            "SELECT domain, category, COUNT(*) AS files, SUM(size) AS bytes,"
+            " SUM(duration) AS duration_sec, SUM(duration IS NULL) AS unprobed"
+            " FROM files GROUP BY domain, category ORDER BY domain, category"
+        )
+        return [dict(r) for r in rows]
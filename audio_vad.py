@@ -0,0 +1,162 @@
+# audio_vad.py
+#
+# 에너지 + zero-crossing rate 기반의 간단한 VAD (voice activity detection).
+# 콜센터 녹음의 무음 / 대기 구간을 잘라내고 말소리 구간만 Whisper에 넣기 위한 전처리.
+#
+#   regions = detect_speech(audio)                  # [(start_sec, end_sec), ...]
+#   speech, offsets = compact_speech(audio, regions)
+#   result = model.transcribe(speech, ...)
+#   remap_segments(result["segments"], offsets)     # 타임스탬프를 원본 기준으로
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+FRAME_MS = 30
+ENERGY_MARGIN_DB = 12.0     # 바닥 소음(하위 percentile)보다 이만큼 크면 유성음 후보
+MIN_ENERGY_DB = -55.0       # 바닥 소음이 아주 작아도 이 값보다는 커야 말소리로 봄
+UNVOICED_MARGIN_DB = 6.0    # 무성음(ㅅ, ㅊ ...)은 에너지가 작은 대신 ZCR이 높음
+UNVOICED_ZCR = 0.25
+NOISE_PERCENTILE = 10
+
+MIN_SPEECH_MS = 250         # 이보다 짧은 구간은 잡음으로 보고 버림
+PAD_MS = 200                # 구간 앞뒤로 붙이는 여유 (단어 앞뒤가 잘리지 않게)
+MERGE_GAP_MS = 500          # 구간 사이 간격이 이보다 짧으면 하나로 합침
+
+
+def frame_features(audio, frame_len: int):
+    """
+    audio를 겹치지 않는 frame_len 샘플 프레임으로 나눠
+    프레임별 에너지(dB)와 zero-crossing rate를 numpy로 한 번에 계산.
+    """
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+    frames = np.asarray(audio[:n_frames * frame_len], dtype=np.float32).reshape(n_frames, frame_len)
+    energy_db = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return energy_db, zcr
+
+
+def speech_frames(
+    energy_db,
+    zcr,
+    energy_margin_db: float = ENERGY_MARGIN_DB,
+    min_energy_db: float = MIN_ENERGY_DB,
+    unvoiced_margin_db: float = UNVOICED_MARGIN_DB,
+    unvoiced_zcr: float = UNVOICED_ZCR,
+):
+    """프레임별 말소리 여부 (bool 배열). 임계값은 파일마다 바닥 소음 기준으로 정한다."""
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+
+    noise_floor = np.percentile(energy_db, NOISE_PERCENTILE)
+    threshold = max(noise_floor + energy_margin_db, min_energy_db)
+
+    voiced = energy_db > threshold
+    unvoiced = (energy_db > threshold - unvoiced_margin_db) & (zcr > unvoiced_zcr)
+    return voiced | unvoiced
+
+
+def frames_to_regions(is_speech, frame_sec: float):
+    """연속된 True 프레임 구간 → [(start_sec, end_sec), ...]"""
+    if len(is_speech) == 0:
+        return []
+    padded = np.concatenate(([False], is_speech, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    starts, ends = edges[0::2], edges[1::2]
+    return [(s * frame_sec, e * frame_sec) for s, e in zip(starts.tolist(), ends.tolist())]
+
+
+def merge_regions(regions, total_sec: float, min_speech_ms=MIN_SPEECH_MS, pad_ms=PAD_MS, merge_gap_ms=MERGE_GAP_MS):
+    """짧은 구간 제거 → 앞뒤 여유 추가 → 가까운 구간 합치기"""
+    min_speech = min_speech_ms / 1000.0
+    pad = pad_ms / 1000.0
+    merge_gap = merge_gap_ms / 1000.0
+
+    merged = []
+    for start, end in regions:
+        if end - start < min_speech:
+            continue
+        start = max(0.0, start - pad)
+        end = min(total_sec, end + pad)
+        if merged and start - merged[-1][1] <= merge_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def detect_speech(audio, sample_rate: int = SAMPLE_RATE, frame_ms: int = FRAME_MS, **kwargs):
+    """
+    파형(float32, mono)에서 말소리 구간을 찾아 [(start_sec, end_sec), ...] 반환.
+    kwargs는 speech_frames / merge_regions의 임계값 (energy_margin_db, pad_ms ...).
+    """
+    frame_len = int(sample_rate * frame_ms / 1000)
+    frame_sec = frame_len / sample_rate
+    total_sec = len(audio) / sample_rate
+
+    frame_kwargs = {k: kwargs.pop(k) for k in list(kwargs)
+                    if k in ("energy_margin_db", "min_energy_db", "unvoiced_margin_db", "unvoiced_zcr")}
+
+    energy_db, zcr = frame_features(audio, frame_len)
+    is_speech = speech_frames(energy_db, zcr, **frame_kwargs)
+    return merge_regions(frames_to_regions(is_speech, frame_sec), total_sec, **kwargs)
+
+
+def compact_speech(audio, regions, sample_rate: int = SAMPLE_RATE):
+    """
+    말소리 구간만 이어 붙인 파형과, 시간 매핑 테이블을 반환.
+    offsets: [(이어 붙인 파형에서 시작 초, 원본에서 시작 초, 길이 초), ...]
+    """
+    pieces = []
+    offsets = []
+    compact_pos = 0
+    for start, end in regions:
+        s = int(round(start * sample_rate))
+        e = int(round(end * sample_rate))
+        if e <= s:
+            continue
+        pieces.append(audio[s:e])
+        offsets.append((compact_pos / sample_rate, s / sample_rate, (e - s) / sample_rate))
+        compact_pos += e - s
+
+    if not pieces:
+        return np.zeros(0, dtype=np.float32), []
+    return np.concatenate(pieces).astype(np.float32, copy=False), offsets
+
+
+def to_original_time(t: float, offsets) -> float:
+    """이어 붙인 파형 기준 시각 t → 원본 오디오 기준 시각"""
+    for compact_start, orig_start, duration in offsets:
+        if t <= compact_start + duration:
+            return orig_start + max(t - compact_start, 0.0)
+    if not offsets:
+        return t
+    compact_start, orig_start, duration = offsets[-1]
+    return orig_start + (t - compact_start)
+
+
+def remap_segments(segments, offsets):
+    """whisper 결과 segments(와 words)의 start / end를 원본 기준으로 바꾼다 (in-place)"""
+    for seg in segments:
+        seg["start"] = to_original_time(seg["start"], offsets)
+        seg["end"] = to_original_time(seg["end"], offsets)
+        for word in seg.get("words") or []:
+            word["start"] = to_original_time(word["start"], offsets)
+            word["end"] = to_original_time(word["end"], offsets)
+    return segments
+
+
+def vad_stats(regions, total_sec: float) -> dict:
+    """말소리 구간 / 전체 길이 / 건너뛴 비율"""
+    speech_sec = sum(end - start for start, end in regions)
+    return {
+        "total_sec": total_sec,
+        "speech_sec": speech_sec,
+        "skipped_fraction": 1.0 - speech_sec / total_sec if total_sec > 0 else 0.0,
+        "num_regions": len(regions),
+        "regions": [(round(s, 3), round(e, 3)) for s, e in regions],
+    }
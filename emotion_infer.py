@@ -1,54 +1,710 @@
 # emotion_infer.py
 import os
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import json
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
 
 # 이 파일 기준으로 모델 폴더 경로
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, "kobert_emotion_final")
 
-print("[emotion_infer] MODEL_DIR:", MODEL_DIR)
-print("[emotion_infer] FILES:", os.listdir(MODEL_DIR))
+MAX_LENGTH = 128
+DEFAULT_BATCH_SIZE = 32
 
-# 1) 토크나이저: HuggingFace monologg/kobert 사용
-tokenizer = AutoTokenizer.from_pretrained(
-    "monologg/kobert",
-    trust_remote_code=True,
-)
+# config에 id2label이 없을 때 쓰는 기본 라벨
+DEFAULT_ID2LABEL = {0: "anger", 1: "sad", 2: "fear"}
 
-# 2) 모델: 네가 fine-tune 한 로컬 모델 사용
-model = AutoModelForSequenceClassification.from_pretrained(
-    MODEL_DIR,
-    local_files_only=True,
-    trust_remote_code=True,
-)
-model.eval()
+# 예측 캐시 크기 (0이면 캐시 끔). 환경변수로 조절 가능
+DEFAULT_CACHE_SIZE = int(os.environ.get("EMOTION_CACHE_SIZE", "10000"))
 
-# 3) id2label 설정 (config에 있으면 그걸 사용)
-if hasattr(model.config, "id2label") and model.config.id2label:
-    id2label = {int(k): v for k, v in model.config.id2label.items()}
-else:
-    id2label = {0: "anger", 1: "sad", 2: "fear"}
+# 양자화 모드: None(fp32) 또는 "int8" (CPU 동적 양자화). 환경변수 EMOTION_QUANTIZE로 선택
+DEFAULT_QUANTIZE = os.environ.get("EMOTION_QUANTIZE", "").strip().lower() or None
+QUANTIZE_MODES = (None, "int8")
 
-print("[emotion_infer] ID2LABEL:", id2label)
+# int8 양자화 모델 state_dict 저장 파일 (fp32 가중치와 같은 폴더)
+QUANTIZED_WEIGHTS_NAME = "pytorch_model_int8.pt"
 
+# 추론 엔진: "torch"(기본) 또는 "onnx"(onnxruntime CPU). 환경변수 EMOTION_BACKEND로 선택
+DEFAULT_BACKEND = os.environ.get("EMOTION_BACKEND", "torch").strip().lower()
+BACKENDS = ("torch", "onnx")
 
-def predict_emotion(text: str):
-    """한 문장의 감정을 (라벨, 점수)로 반환"""
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
+# ONNX로 내보낸 모델 파일 (없으면 onnx 백엔드 첫 로딩 때 자동 export)
+ONNX_MODEL_NAME = "model.onnx"
+ONNX_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+ONNX_EXPORT_ATOL = 1e-4
+
+# packed 추론: 짧은 문장 여러 개를 128 토큰 한 줄에 이어 붙여서 한 번에 forward (torch 전용).
+# 환경변수 EMOTION_PACKED=1 로 켬
+DEFAULT_PACKED = os.environ.get("EMOTION_PACKED", "0").strip().lower() in ("1", "true", "yes")
+PACKED_ATOL = 1e-4
+
+
+# SentencePiece 모델 파일 이름 후보
+# (monologg/kobert 원본 이름, save_from_checkpoint.py가 복사할 때 쓰는 이름)
+SP_MODEL_FILENAMES = ("tokenizer_78b3253a26.model", "tokenizer.model")
+
+# SentencePiece 모델 파일을 직접 지정 (model_dir 밖에 둔 경우). 환경변수 EMOTION_SP_MODEL
+DEFAULT_SP_MODEL = os.environ.get("EMOTION_SP_MODEL", "").strip() or None
+
+
+def load_tokenizer(model_dir: str = MODEL_DIR, sp_model_path: str = None):
+    """
+    model_dir 안의 vocab.txt / SentencePiece 모델 / tokenizer_config.json 으로
+    KoBertTokenizer를 직접 만든다. 네트워크나 trust_remote_code가 필요 없다.
+    SentencePiece 모델은 sp_model_path(또는 EMOTION_SP_MODEL) → model_dir 순서로 찾고,
+    없으면 허브에 접속하지 않고 바로 FileNotFoundError.
+    """
+    from tokenization_kobert import KoBertTokenizer
+
+    vocab_txt = os.path.join(model_dir, "vocab.txt")
+    if not os.path.isfile(vocab_txt):
+        raise FileNotFoundError(f"vocab.txt를 찾을 수 없음: {vocab_txt}")
+
+    sp_model_path = sp_model_path or DEFAULT_SP_MODEL
+    if sp_model_path is not None:
+        if not os.path.isfile(sp_model_path):
+            raise FileNotFoundError(f"지정한 SentencePiece 모델 파일이 없음: {sp_model_path}")
+        vocab_file = sp_model_path
+    else:
+        for name in SP_MODEL_FILENAMES:
+            vocab_file = os.path.join(model_dir, name)
+            if os.path.isfile(vocab_file):
+                break
+        else:
+            raise FileNotFoundError(
+                f"SentencePiece 모델 파일({', '.join(SP_MODEL_FILENAMES)})을 {model_dir} 안에서 찾지 못함. "
+                f"monologg/kobert의 {SP_MODEL_FILENAMES[0]} 을 {model_dir} 에 넣거나 "
+                f"(lib/save_from_checkpoint.py가 같이 복사함) 환경변수 EMOTION_SP_MODEL로 경로를 지정하세요."
+            )
+
+    config = {}
+    config_path = os.path.join(model_dir, "tokenizer_config.json")
+    if os.path.isfile(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    return KoBertTokenizer(
+        vocab_file=vocab_file,
+        vocab_txt=vocab_txt,
+        do_lower_case=config.get("do_lower_case", False),
+        unk_token=config.get("unk_token", "[UNK]"),
+        sep_token=config.get("sep_token", "[SEP]"),
+        pad_token=config.get("pad_token", "[PAD]"),
+        cls_token=config.get("cls_token", "[CLS]"),
+        mask_token=config.get("mask_token", "[MASK]"),
+        model_max_length=config.get("model_max_length", 512),
+    )
+
+
+def load_id2label(model_dir: str = MODEL_DIR) -> dict:
+    """config.json의 id2label (없으면 기본 라벨)"""
+    config_path = os.path.join(model_dir, "config.json")
+    if os.path.isfile(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if config.get("id2label"):
+            return {int(k): v for k, v in config["id2label"].items()}
+    return dict(DEFAULT_ID2LABEL)
+
+
+def export_onnx(model_dir: str = MODEL_DIR, onnx_path: str = None, atol: float = ONNX_EXPORT_ATOL) -> str:
+    """
+    fine-tune 된 PyTorch 모델을 ONNX로 내보낸다 (batch / sequence 축은 dynamic).
+
+    내보낸 뒤 onnxruntime으로 같은 입력을 돌려 PyTorch logits와 비교하고,
+    최대 오차가 atol을 넘으면 파일을 지우고 RuntimeError를 낸다.
+    """
+    import numpy as np
+    import torch
+    import onnxruntime as ort
+    from transformers import AutoModelForSequenceClassification
+
+    onnx_path = onnx_path or os.path.join(model_dir, ONNX_MODEL_NAME)
+    tmp_path = f"{onnx_path}.{os.getpid()}.tmp"
+
+    tokenizer = load_tokenizer(model_dir)
+    # ONNX 그래프가 단순하도록 eager attention으로 로드 (ORT가 attention을 다시 fuse 함)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_dir,
+        local_files_only=True,
+        attn_implementation="eager",
+    ).eval()
+
+    sample = tokenizer(
+        ["배송이 너무 늦어요", "환불 받고 싶은데 언제쯤 처리되는지 알려 주세요"],
         padding=True,
-        max_length=128,
+        return_tensors="pt",
     )
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probs = torch.softmax(outputs.logits, dim=1)
-        score, idx = torch.max(probs, dim=1)
+    inputs = tuple(sample[name] for name in ONNX_INPUT_NAMES)
+
+    print(f"[emotion_infer] ONNX export → {onnx_path}")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUT_NAMES}
+    dynamic_axes["logits"] = {0: "batch"}
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # torch 2.9+ 기본값인 dynamo exporter는 가중치를 "<파일>.data"로 따로 빼서
+        # tmp 파일만 교체하면 그래프가 tmp 이름의 data 파일을 가리키게 된다 → 기존 exporter로 한 파일에 저장
+        export_kwargs["dynamo"] = False
+
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                inputs,
+                tmp_path,
+                input_names=list(ONNX_INPUT_NAMES),
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                **export_kwargs,
+            )
+            expected = model(*inputs).logits.numpy()
+
+        session = ort.InferenceSession(tmp_path, providers=["CPUExecutionProvider"])
+        actual = session.run(["logits"], {name: t.numpy() for name, t in zip(ONNX_INPUT_NAMES, inputs)})[0]
+        max_diff = float(np.abs(actual - expected).max())
+
+        if max_diff > atol:
+            raise RuntimeError(f"ONNX logits 오차가 너무 큼: max_diff={max_diff:.2e} > atol={atol:.0e}")
+
+        # 여러 워커가 동시에 export 해도 완성된 파일만 보이도록 마지막에 교체
+        os.replace(tmp_path, onnx_path)
+    finally:
+        # 실패했거나 exporter가 외부 data 파일을 만들었으면 남은 임시 파일을 지운다
+        for path in (tmp_path, f"{tmp_path}.data"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    print(f"[emotion_infer] ONNX 검증 통과 (max_diff={max_diff:.2e})")
+    return onnx_path
+
+
+def quantize_model(model):
+    """BERT의 Linear 레이어들을 동적 int8 양자화 (CPU 전용, 새 모델 반환)"""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(
+        model.eval(), {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def save_quantized_model(model, model_dir: str = MODEL_DIR) -> str:
+    """양자화된 모델의 state_dict를 model_dir에 저장하고 경로를 반환"""
+    import torch
+
+    path = os.path.join(model_dir, QUANTIZED_WEIGHTS_NAME)
+    torch.save(model.state_dict(), path)
+    return path
+
+
+def pack_sequences(lengths, capacity: int = MAX_LENGTH):
+    """
+    길이 리스트를 capacity 토큰짜리 row들에 first-fit decreasing으로 채운다.
+    [[문장 index, ...], ...] (row별) 반환.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    rows = []
+    free = []
+    for i in order:
+        for r, space in enumerate(free):
+            if lengths[i] <= space:
+                rows[r].append(i)
+                free[r] -= lengths[i]
+                break
+        else:
+            rows.append([i])
+            free.append(capacity - lengths[i])
+    return rows
+
+
+class PredictionCache:
+    """
+    정규화된 발화 텍스트 → 예측 결과를 저장하는 LRU 캐시 (thread-safe).
+
+    "네", "감사합니다" 같은 짧은 고객 발화가 계속 반복되므로
+    같은 문장은 모델을 다시 돌리지 않고 캐시에서 꺼낸다.
+    maxsize를 넘으면 가장 오래 안 쓰인 항목부터 버린다.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """있으면 값을 반환하고 최근 사용으로 표시, 없으면 None"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize: int):
+        """캐시 크기 변경 (줄이면 오래된 항목부터 버림)"""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > max(maxsize, 0):
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class EmotionModel:
+    """
+    토크나이저 + 감정 분류 모델 핸들.
+
+    import 시점에는 아무것도 로드하지 않고, 처음 예측할 때(또는 load()/warmup()을
+    직접 부를 때) 한 번만 로드한다. 여러 스레드가 동시에 불러도 로딩은 한 번만 일어난다.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = MODEL_DIR,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        quantize: str = DEFAULT_QUANTIZE,
+        backend: str = DEFAULT_BACKEND,
+        packed: bool = DEFAULT_PACKED,
+    ):
+        if quantize not in QUANTIZE_MODES:
+            raise ValueError(f"지원하지 않는 quantize 값: {quantize!r} (가능: {QUANTIZE_MODES})")
+        if backend not in BACKENDS:
+            raise ValueError(f"지원하지 않는 backend 값: {backend!r} (가능: {BACKENDS})")
+        if backend == "onnx" and quantize is not None:
+            raise ValueError("quantize는 torch backend에서만 지원")
+        if backend == "onnx" and packed:
+            raise ValueError("packed는 torch backend에서만 지원")
+        if packed and quantize is not None:
+            # int8 동적 양자화는 activation scale을 배치(텐서) 단위로 잡아서, 문장을 어떤 row에
+            # 같이 넣느냐에 따라 확률이 바뀐다 (측정 시 unpacked와 약 8.6e-3 차이 → PACKED_ATOL 보장 불가)
+            raise ValueError("packed는 quantize와 같이 쓸 수 없음 (int8은 배치 구성에 따라 결과가 달라짐)")
+
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self.backend = backend
+        self.packed = packed
+        self.tokenizer = None
+        self.model = None
+        self.id2label = None
+        self.load_seconds = None   # 로딩에 걸린 시간(초)
+        self.cache = PredictionCache(cache_size)
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def load(self):
+        """모델/토크나이저를 로드 (이미 로드돼 있으면 그대로 반환)"""
+        if self.loaded:
+            return self
+
+        with self._lock:
+            if self.loaded:
+                return self
+
+            start = time.perf_counter()
+            print("[emotion_infer] MODEL_DIR:", self.model_dir)
+
+            # 1) 토크나이저: 모델 폴더에 같이 있는 KoBERT 파일로 직접 생성 (허브 접속 X)
+            tokenizer = load_tokenizer(self.model_dir)
+
+            # 2) 모델: 네가 fine-tune 한 로컬 모델 사용
+            #    (quantize="int8"이면 양자화 버전, backend="onnx"면 onnxruntime 세션)
+            if self.backend == "onnx":
+                model = self._load_onnx_session()
+            else:
+                model = self._load_classifier()
+
+            # 3) id2label 설정 (config에 있으면 그걸 사용)
+            id2label = load_id2label(self.model_dir)
+
+            self.tokenizer = tokenizer
+            self.id2label = id2label
+            self.load_seconds = time.perf_counter() - start
+            # model을 마지막에 채워야 loaded 체크가 로딩 완료 후에만 True가 됨
+            self.model = model
+
+            print("[emotion_infer] ID2LABEL:", id2label)
+            print(
+                f"[emotion_infer] 모델 로딩 완료 "
+                f"(backend={self.backend}, mode={self.quantize or 'fp32'}, packed={self.packed}, "
+                f"{self.load_seconds:.2f}s)"
+            )
+
+        return self
+
+    def _load_onnx_session(self):
+        import onnxruntime as ort
+
+        onnx_path = os.path.join(self.model_dir, ONNX_MODEL_NAME)
+        if not os.path.isfile(onnx_path):
+            export_onnx(self.model_dir, onnx_path)
+
+        options = ort.SessionOptions()
+        # attention / GELU fusion 등 전체 그래프 최적화
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def _load_classifier(self):
+        import torch
+        from transformers import AutoConfig, AutoModelForSequenceClassification
+
+        if self.quantize is None:
+            model = AutoModelForSequenceClassification.from_pretrained(
+                self.model_dir,
+                local_files_only=True,
+            )
+            return model.eval()
+
+        # int8: 미리 저장해 둔 양자화 가중치가 있으면 fp32 가중치를 읽지 않고 바로 로드
+        quantized_path = os.path.join(self.model_dir, QUANTIZED_WEIGHTS_NAME)
+        if os.path.isfile(quantized_path):
+            config = AutoConfig.from_pretrained(self.model_dir, local_files_only=True)
+            model = quantize_model(AutoModelForSequenceClassification.from_config(config))
+            # 직접 만든 로컬 파일이라 packed param 객체까지 그대로 읽는다
+            model.load_state_dict(torch.load(quantized_path, weights_only=False))
+            return model.eval()
+
+        model = AutoModelForSequenceClassification.from_pretrained(
+            self.model_dir,
+            local_files_only=True,
+        )
+        return quantize_model(model)
+
+    @property
+    def labels(self):
+        """확률 벡터의 순서대로 나열한 라벨 리스트"""
+        self.load()
+        return [self.id2label[i] for i in range(len(self.id2label))]
+
+    def warmup(self, batch_size: int = DEFAULT_BATCH_SIZE) -> float:
+        """
+        로드 + 더미 배치 1회 forward. 첫 요청이 느려지지 않도록 워커 시작 시 호출.
+        더미 forward에 걸린 시간(초)을 반환.
+        """
+        self.load()
+        start = time.perf_counter()
+        # 캐시를 거치면 같은 문장이 1개로 합쳐지므로 모델을 직접 돌린다
+        self._predict_uncached(["워밍업용 문장입니다."] * batch_size, batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"[emotion_infer] warmup 완료 (batch={batch_size}, {elapsed:.2f}s)")
+        return elapsed
+
+    def predict(self, texts, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        여러 문장의 감정을 한 번에 [(라벨, 점수), ...]로 반환 (입력 순서 유지).
+
+        캐시에 없는 문장만 모델에 넣는다. 같은 배치 안에서 정규화 결과가
+        같은 문장이 여러 번 나오면 한 번만 예측한다.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        self.load()
+        if self.cache.maxsize <= 0:
+            return self._predict_uncached(texts, batch_size)
+
+        results = [None] * len(texts)
+        pending = {}   # 정규화 key → 그 key를 가진 입력 위치들
+
+        for i, text in enumerate(texts):
+            key = self.tokenizer.preprocess_text(text)
+            hit = self.cache.get(key)
+            if hit is not None:
+                results[i] = hit
+            elif key in pending:
+                pending[key].append(i)
+            else:
+                pending[key] = [i]
+
+        if pending:
+            keys = list(pending)
+            preds = self._predict_uncached([texts[pending[k][0]] for k in keys], batch_size)
+            for key, pred in zip(keys, preds):
+                self.cache.put(key, pred)
+                for i in pending[key]:
+                    results[i] = pred
+
+        return results
+
+    def predict_probs(self, texts, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        각 문장의 클래스별 확률 벡터(self.labels 순서) 리스트를 반환 (캐시 미사용).
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        self.load()
+        return self._predict_probs_uncached(texts, batch_size)
+
+    def encode_batch(self, texts):
+        """
+        문장 리스트 → 가장 긴 문장 길이까지 패딩된 모델 입력 배치 1개.
+        토크나이즈와 forward를 다른 스레드에서 돌리는 파이프라인용.
+        """
+        self.load()
+        return self.tokenizer.batch_encode_fast(
+            texts, max_length=MAX_LENGTH, return_tensors=self._tensor_type()
+        )
 
-    label = id2label[int(idx.item())]
-    return label, float(score)
+    def predict_encoded(self, batch, return_probs: bool = False):
+        """encode_batch 결과 1개를 모델에 넣어 [(라벨, 점수), ...] 반환"""
+        self.load()
+        with self._inference_context():
+            probs_list = self._forward_probs(batch)
+        return self.to_predictions(probs_list, return_probs)
+
+    def to_predictions(self, probs_list, return_probs: bool = False):
+        """
+        확률 벡터 리스트 → [(라벨, 점수), ...]
+        return_probs=True면 [(라벨, 점수, {라벨: 확률}), ...]
+        """
+        results = []
+        for probs in probs_list:
+            idx = max(range(len(probs)), key=probs.__getitem__)
+            if return_probs:
+                probs_by_label = {self.id2label[i]: p for i, p in enumerate(probs)}
+                results.append((self.id2label[idx], float(probs[idx]), probs_by_label))
+            else:
+                results.append((self.id2label[idx], float(probs[idx])))
+        return results
+
+    def _predict_uncached(self, texts, batch_size):
+        """캐시 없이 모델을 돌려 [(라벨, 점수), ...] 반환"""
+        return self.to_predictions(self._predict_probs_uncached(texts, batch_size))
+
+    def _tensor_type(self):
+        # onnx 백엔드는 torch를 import 하지 않는다
+        return "np" if self.backend == "onnx" else "pt"
+
+    def _inference_context(self):
+        if self.backend == "onnx":
+            return nullcontext()
+        import torch
+        return torch.inference_mode()
+
+    def _predict_probs_uncached(self, texts, batch_size):
+        """
+        캐시 없이 모델을 돌려 확률 벡터 리스트를 반환.
+
+        토큰 길이 순으로 정렬한 뒤 batch_size 단위로 묶고,
+        각 배치는 그 배치에서 가장 긴 문장 길이까지만 패딩한다.
+        packed=True면 _predict_probs_packed로 처리.
+        """
+        if self.packed:
+            return self._predict_probs_packed(texts, batch_size)
+
+        from transformers import BatchEncoding
+
+        # 전체를 한 번에 (가장 긴 문장까지 패딩해서) 인코딩 → 실제 길이 기준 정렬
+        encoded = self.tokenizer.batch_encode_fast(texts, max_length=MAX_LENGTH)
+        lengths = encoded["attention_mask"].sum(axis=1)
+        order = lengths.argsort(kind="stable")
+
+        tensor_type = self._tensor_type()
+
+        results = [None] * len(texts)
+        with self._inference_context():
+            for start in range(0, len(order), batch_size):
+                idxs = order[start:start + batch_size]
+                width = int(lengths[idxs].max())
+                batch = BatchEncoding(
+                    {k: v[idxs, :width] for k, v in encoded.items()},
+                    tensor_type=tensor_type,
+                )
+
+                for i, p in zip(idxs.tolist(), self._forward_probs(batch)):
+                    results[i] = p
+
+        return results
+
+    def _predict_probs_packed(self, texts, batch_size):
+        """
+        여러 문장을 MAX_LENGTH 토큰 한 줄에 이어 붙여서 forward 하고 확률 벡터 리스트를 반환.
+
+        - attention mask는 (batch, L, L) block-diagonal: 같은 문장 토큰끼리만 attend
+        - position ids는 문장마다 0부터 다시 시작
+        - 각 문장의 [CLS] 위치 hidden을 pooler(dense + tanh) → classifier 에 넣는다
+        batch_size는 문장 수가 아니라 packed row 수. 결과는 unpacked와 PACKED_ATOL 안에서 같다
+        (fp32 전용, quantize와는 같이 못 씀).
+        """
+        import numpy as np
+        import torch
+
+        model = self.model
+        if not hasattr(model, "bert") or model.bert.pooler is None:
+            raise ValueError("packed 추론은 pooler가 있는 BertForSequenceClassification 모델만 지원")
+
+        encoded = self.tokenizer.batch_encode_fast(texts, max_length=MAX_LENGTH)
+        input_ids_all = encoded["input_ids"]
+        lengths = encoded["attention_mask"].sum(axis=1).tolist()
+        rows = pack_sequences(lengths, MAX_LENGTH)
+        pad_id = self.tokenizer.pad_token_id
+
+        bert = model.bert
+        results = [None] * len(texts)
+        with self._inference_context():
+            for start in range(0, len(rows), batch_size):
+                chunk = rows[start:start + batch_size]
+                width = max(sum(lengths[i] for i in row) for row in chunk)
+
+                input_ids = np.full((len(chunk), width), pad_id, dtype=np.int64)
+                position_ids = np.zeros((len(chunk), width), dtype=np.int64)
+                segment = np.full((len(chunk), width), -1, dtype=np.int64)
+                cls_rows, cls_cols, owners = [], [], []
+
+                for b, row in enumerate(chunk):
+                    pos = 0
+                    for k, i in enumerate(row):
+                        n = lengths[i]
+                        input_ids[b, pos:pos + n] = input_ids_all[i, :n]
+                        position_ids[b, pos:pos + n] = np.arange(n)
+                        segment[b, pos:pos + n] = k
+                        cls_rows.append(b)
+                        cls_cols.append(pos)
+                        owners.append(i)
+                        pos += n
+
+                # 같은 문장끼리만 1. 패딩 토큰은 자기 자신만 보게 해서 전부 막힌 행이 없게 한다
+                mask = (segment[:, :, None] == segment[:, None, :]) & (segment[:, :, None] >= 0)
+                mask |= np.eye(width, dtype=bool)[None, :, :]
+
+                hidden = bert(
+                    input_ids=torch.from_numpy(input_ids),
+                    attention_mask=torch.from_numpy(mask.astype(np.int64)),
+                    token_type_ids=torch.zeros_like(torch.from_numpy(input_ids)),
+                    position_ids=torch.from_numpy(position_ids),
+                ).last_hidden_state
+
+                cls = hidden[torch.tensor(cls_rows), torch.tensor(cls_cols)]
+                pooled = bert.pooler.activation(bert.pooler.dense(cls))
+                logits = model.classifier(model.dropout(pooled))
+
+                for i, p in zip(owners, torch.softmax(logits, dim=1).tolist()):
+                    results[i] = p
+
+        return results
+
+    def _forward_probs(self, batch):
+        """패딩된 배치 1개 → 확률 벡터 리스트"""
+        if self.backend == "onnx":
+            import numpy as np
+
+            feeds = {name: batch[name].astype(np.int64) for name in ONNX_INPUT_NAMES}
+            logits = self.model.run(["logits"], feeds)[0]
+            logits = logits - logits.max(axis=1, keepdims=True)
+            exp = np.exp(logits)
+            return (exp / exp.sum(axis=1, keepdims=True)).tolist()
+
+        import torch
+
+        outputs = self.model(**batch)
+        return torch.softmax(outputs.logits, dim=1).tolist()
+
+
+_emotion_model = None
+_emotion_model_lock = threading.Lock()
+
+
+def get_emotion_model() -> EmotionModel:
+    """프로세스 전체에서 공유하는 EmotionModel 싱글톤 (아직 로드는 안 함)"""
+    global _emotion_model
+    if _emotion_model is None:
+        with _emotion_model_lock:
+            if _emotion_model is None:
+                _emotion_model = EmotionModel()
+    return _emotion_model
+
+
+def warmup(batch_size: int = DEFAULT_BATCH_SIZE) -> float:
+    """공유 모델을 로드하고 더미 배치를 한 번 돌린다."""
+    return get_emotion_model().warmup(batch_size=batch_size)
+
+
+def cache_stats() -> dict:
+    """공유 모델의 예측 캐시 통계 (hits / misses / evictions / size ...)"""
+    return get_emotion_model().cache.stats()
+
+
+def configure_cache(maxsize: int):
+    """공유 모델의 예측 캐시 크기 변경 (0이면 캐시 끔)"""
+    get_emotion_model().cache.resize(maxsize)
+
+
+def __getattr__(name):
+    # 예전 코드 호환: `from emotion_infer import tokenizer, model, id2label`
+    # 처럼 모듈 변수로 접근하면 그때 로드해서 돌려준다.
+    if name in ("tokenizer", "model", "id2label"):
+        return getattr(get_emotion_model().load(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def predict_emotions(texts, batch_size: int = DEFAULT_BATCH_SIZE, return_probs: bool = False):
+    """
+    여러 문장의 감정을 [(라벨, 점수), ...]로 반환 (입력 순서 유지).
+    return_probs=True면 [(라벨, 점수, {라벨: 확률}), ...] (전체 확률 벡터 포함, 캐시 미사용)
+    """
+    emotion_model = get_emotion_model()
+    if not return_probs:
+        return emotion_model.predict(texts, batch_size=batch_size)
+
+    probs_list = emotion_model.predict_probs(texts, batch_size=batch_size)
+    return emotion_model.to_predictions(probs_list, return_probs=True)
+
+
+def predict_emotion(text: str):
+    """한 문장의 감정을 (라벨, 점수)로 반환"""
+    return predict_emotions([text])[0]
+
+
+def predict_emotion_probs(texts, batch_size: int = DEFAULT_BATCH_SIZE):
+    """여러 문장의 클래스별 확률 벡터(emotion_labels() 순서) 리스트를 반환"""
+    return get_emotion_model().predict_probs(texts, batch_size=batch_size)
+
+
+def emotion_labels():
+    """확률 벡터 순서의 라벨 리스트 (config만 읽고 모델은 로드하지 않음)"""
+    id2label = load_id2label(get_emotion_model().model_dir)
+    return [id2label[i] for i in sorted(id2label)]
 
 
 def predict_emotions_by_utterance(
@@ -56,6 +712,7 @@ def predict_emotions_by_utterance(
     speaker_key: str = "speaker",
     text_key: str = "text",
     customer_tag: str = "고객",
+    batch_size: int = DEFAULT_BATCH_SIZE,
 ):
     """
     발화 리스트 단위로 감정 분석해 주는 함수.
@@ -71,10 +728,25 @@ def predict_emotions_by_utterance(
     speaker_key : 화자 정보 key 이름 (기본 "speaker")
     text_key    : 실제 텍스트가 들어 있는 key 이름 (기본 "text")
     customer_tag: 고객을 나타내는 값 (예: "고객", "customer", "user" 등)
+    batch_size  : 한 번의 forward에 넣을 최대 고객 발화 수
+
+    고객 발화를 먼저 모두 모은 뒤 predict_emotions로 한꺼번에 예측한다.
     """
 
-    results = []
-    customer_turn_index = 1  # 1번째 고객 발화, 2번째 고객 발화...
+    results = collect_customer_turns(utterances, speaker_key, text_key, customer_tag)
+
+    preds = predict_emotions([r["text"] for r in results], batch_size=batch_size)
+    for r, (label, score) in zip(results, preds):
+        r["emotion"] = label
+        r["score"] = score                              # 예측 확률(신뢰도)
+
+    return results
+
+
+def collect_customer_turns(utterances, speaker_key, text_key, customer_tag, start_index=1):
+    """감정 분석 대상(고객 발화)만 골라 customer_turn_index를 매긴 dict 리스트로 반환"""
+    turns = []
+    customer_turn_index = start_index  # 1번째 고객 발화, 2번째 고객 발화...
 
     for utt in utterances:
         speaker = (utt.get(speaker_key) or "").strip()
@@ -86,20 +758,16 @@ def predict_emotions_by_utterance(
         if not text:
             continue
 
-        label, score = predict_emotion(text)
-
-        results.append({
+        turns.append({
             "customer_turn_index": customer_turn_index,  # 고객 기준 n번째 발화
             "raw_turn_index": utt.get("turn"),          # 전체 대화 기준 turn (있으면)
             "speaker": speaker,
             "text": text,
-            "emotion": label,
-            "score": score,                             # 예측 확률(신뢰도)
         })
 
         customer_turn_index += 1
 
-    return results
+    return turns
 
 
 def get_last_customer_emotion(
@@ -128,15 +796,177 @@ def get_last_customer_emotion(
         "score": 0.93
     }
     """
-    results = predict_emotions_by_utterance(
-        conversation,
-        speaker_key=speaker_key,
-        text_key=text_key,
-        customer_tag=customer_tag,
-    )
+    # 마지막 고객 발화 하나만 모델에 넣으면 됨 (turn 번호는 앞에서 세어 둠)
+    turns = collect_customer_turns(conversation, speaker_key, text_key, customer_tag)
 
-    if not results:
+    if not turns:
         return None
 
     # 가장 마지막 고객 발화의 감정 정보
-    return results[-1]
+    last = turns[-1]
+    last["emotion"], last["score"] = predict_emotions([last["text"]])[0]
+    return last
+
+
+# 이 시간(초) 동안 업데이트가 없는 통화의 tracker는 버린다
+DEFAULT_TRACKER_TTL = 30 * 60
+
+
+class ConversationEmotionTracker:
+    """
+    통화 중 실시간으로 들어오는 발화를 받아서 '새 고객 발화'만 감정 분석하는 tracker.
+
+    매 턴마다 get_last_customer_emotion(전체 대화)를 다시 부르면 통화가 길어질수록
+    비용이 제곱으로 커지므로, 지금까지의 결과 / customer_turn_index / 마지막 감정을
+    메모리에 들고 있다가 새로 들어온 발화만 처리한다.
+    """
+
+    def __init__(
+        self,
+        speaker_key: str = "speaker",
+        text_key: str = "text",
+        customer_tag: str = "고객",
+    ):
+        self.speaker_key = speaker_key
+        self.text_key = text_key
+        self.customer_tag = customer_tag
+
+        self.results = []              # predict_emotions_by_utterance와 같은 형식
+        self.customer_turn_index = 0   # 지금까지 분석한 고객 발화 수
+        self.num_utterances = 0        # 지금까지 받은 전체 발화 수 (상담사 포함)
+        self.updated_at = time.monotonic()
+        self.active = 0                # registry가 update 중인 호출 수 (0보다 크면 정리 대상 아님)
+        self._lock = threading.Lock()
+
+    @property
+    def last_emotion(self):
+        """마지막 고객 발화의 감정 정보 (아직 없으면 None)"""
+        return self.results[-1] if self.results else None
+
+    def update(self, new_utterances):
+        """
+        새로 들어온 발화들만 넘기면 그 중 고객 발화만 감정 분석해서
+        새 결과 리스트를 반환한다.
+        """
+        new_utterances = list(new_utterances)
+
+        with self._lock:
+            return self._update_locked(new_utterances)
+
+    def _update_locked(self, new_utterances):
+        """update 본체 (self._lock을 잡은 상태에서 호출)"""
+        turns = collect_customer_turns(
+            new_utterances,
+            self.speaker_key,
+            self.text_key,
+            self.customer_tag,
+            start_index=self.customer_turn_index + 1,
+        )
+
+        preds = predict_emotions([t["text"] for t in turns])
+        for t, (label, score) in zip(turns, preds):
+            t["emotion"] = label
+            t["score"] = score
+
+        self.results.extend(turns)
+        self.customer_turn_index += len(turns)
+        self.num_utterances += len(new_utterances)
+        self.updated_at = time.monotonic()
+        return turns
+
+    def sync(self, conversation):
+        """
+        지금까지의 전체 대화를 넘기면 이전에 본 뒤로 추가된 발화만 처리한다.
+        (대화 리스트가 뒤에만 추가된다고 가정)
+        어디까지 봤는지 읽는 것과 갱신을 같은 lock 안에서 해서 동시에 불러도 같은 턴을 두 번 세지 않는다.
+        """
+        with self._lock:
+            return self._update_locked(list(conversation[self.num_utterances:]))
+
+
+class ConversationTrackerRegistry:
+    """
+    통화 ID → ConversationEmotionTracker 저장소 (thread-safe).
+    ttl초 동안 업데이트가 없는 통화는 get / remove 때 정리되고,
+    요청이 뜸한 서버에서는 evict_expired()를 주기적으로 부르거나
+    sweep_interval(초)을 주면 백그라운드 스레드가 그 간격으로 정리한다.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TRACKER_TTL, sweep_interval: float = None, **tracker_kwargs):
+        self.ttl = ttl
+        self.tracker_kwargs = tracker_kwargs
+        self.evictions = 0
+        self._trackers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        if sweep_interval:
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, args=(sweep_interval,), name="tracker-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def __len__(self):
+        return len(self._trackers)
+
+    def get(self, call_id) -> ConversationEmotionTracker:
+        """call_id의 tracker를 반환 (없으면 새로 만듦). 꺼낼 때 마지막 사용 시각도 갱신한다"""
+        with self._lock:
+            return self._get_locked(call_id)
+
+    def _get_locked(self, call_id):
+        self._evict_expired()
+        tracker = self._trackers.get(call_id)
+        if tracker is None:
+            tracker = ConversationEmotionTracker(**self.tracker_kwargs)
+            self._trackers[call_id] = tracker
+        tracker.updated_at = time.monotonic()
+        return tracker
+
+    def update(self, call_id, new_utterances):
+        """
+        call_id 통화에 새 발화를 추가하고 마지막 고객 감정을 반환.
+        감정 예측은 registry lock 밖에서 하되, 그동안 tracker가 정리되지 않게 active로 표시한다.
+        """
+        with self._lock:
+            tracker = self._get_locked(call_id)
+            tracker.active += 1
+        try:
+            tracker.update(new_utterances)
+        finally:
+            with self._lock:
+                tracker.active -= 1
+                tracker.updated_at = time.monotonic()
+        return tracker.last_emotion
+
+    def remove(self, call_id):
+        """통화가 끝났을 때 명시적으로 정리"""
+        with self._lock:
+            self._evict_expired()
+            return self._trackers.pop(call_id, None)
+
+    def evict_expired(self) -> int:
+        """ttl이 지난 tracker를 지금 정리하고, 지운 개수를 반환"""
+        with self._lock:
+            return self._evict_expired()
+
+    def close(self):
+        """백그라운드 정리 스레드를 멈춘다 (sweep_interval을 준 경우)"""
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.evict_expired()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [
+            cid for cid, t in self._trackers.items()
+            if not t.active and now - t.updated_at > self.ttl
+        ]
+        for cid in expired:
+            del self._trackers[cid]
+        self.evictions += len(expired)
+        return len(expired)
@@ -2,17 +2,45 @@
 
 from stt_agent import STTAgent
 from emotion_agent import EmotionAgent
+from stt_infer import (
+    BULK_BATCH_SIZE,
+    SAMPLE_RATE,
+    load_audio,
+    probe_durations,
+    transcribe_audio,
+    transcribe_cascade,
+    transcribe_many,
+)
+from audio_catalog import DEFAULT_CATALOG_PATH, AudioCatalog
+from worker_pool import default_threads_per_worker, limit_threads, spawn_pool
 
 import os
+import queue
+import threading
+import time
+
+# 스트리밍 모드 기본값: whisper 입력 창 크기(30초)와, 미리 인식해 둘 창 개수
+STREAM_WINDOW_SEC = 30.0
+STREAM_BUFFER_WINDOWS = 2
+
+# 창 끝에 걸친 마지막 segment는 잘렸을 수 있어서 다음 창에서 다시 인식
+_MIN_ADVANCE_SEC = 1.0
+_PROMPT_CHARS = 200
+
+_DONE = object()
+
 
 class CallcenterAudioProcessor:
     """
     음성 파일을 입력받아 STT → 감정분석까지 한 번에 처리하는 최종 헬퍼 클래스.
     """
 
-    def __init__(self, stt_device="mps"):
-        self.stt_agent = STTAgent(device=stt_device)
+    def __init__(self, stt_device=None, stt_model_size=None, **stt_options):
+        """stt_options는 STTAgent에 그대로 넘긴다 (dtype, language, vad, use_cache, cascade)"""
+        # Whisper 모델은 stt_infer 레지스트리에서 공유 (프로세서를 여러 개 만들어도 1번만 로드)
+        self.stt_agent = STTAgent(device=stt_device, model_size=stt_model_size, **stt_options)
         self.emotion_agent = EmotionAgent()
+        self.last_stream_stats = None
 
     def process_audio(self, audio_path: str) -> dict:
         if not os.path.isfile(audio_path):
@@ -29,3 +57,277 @@ class CallcenterAudioProcessor:
             "text": text,
             "emotion": emotion,
         }
+
+    def process_audio_batch(self, audio_paths, batch_size: int = BULK_BATCH_SIZE):
+        """
+        여러 파일을 처리량 위주로 한꺼번에 처리 (backfill용).
+        STT는 여러 파일의 30초 창을 묶어서 배치 디코딩(stt_infer.transcribe_many)하고,
+        process_audio와 같은 형태의 dict를 입력 순서대로 yield 한다. 실패한 파일은 "error" 포함.
+        배치 디코딩은 VAD / cascade를 지원하지 않으므로 STTAgent에 둘 중 하나라도 켜져 있으면 ValueError.
+        """
+        agent = self.stt_agent
+        unsupported = [name for name, on in (("vad", agent.vad), ("cascade", agent.escalate_model is not None)) if on]
+        if unsupported:
+            raise ValueError(
+                f"process_audio_batch는 {' / '.join(unsupported)}를 지원하지 않음 "
+                "(STT_VAD / STT_CASCADE를 끄거나 process_audio / process_many 사용)"
+            )
+        results = transcribe_many(
+            audio_paths,
+            model_size=agent.model_size,
+            device=agent.device,
+            dtype=agent.dtype,
+            language=agent.language,
+            batch_size=batch_size,
+            use_cache=agent.cache is not None,
+        )
+        for audio_path, result in results:
+            if "error" in result:
+                yield {"audio_path": audio_path, "text": "", "emotion": None, "error": result["error"]}
+                continue
+            yield {
+                "audio_path": audio_path,
+                "text": result["text"],
+                "emotion": self.emotion_agent.predict(result["text"]),
+            }
+
+    def process_many(self, audio_paths, workers: int = 1, threads_per_worker: int = None):
+        """
+        여러 파일을 워커 프로세스 풀에서 STT → 감정분석.
+        각 워커는 이 프로세서와 같은 STT 설정(self.stt_agent.config())으로 Whisper / KoBERT를 1번만 로드하고,
+        코어를 워커 수로 나눈 스레드만 쓴다.
+        긴 파일부터 먼저 넣어서 마지막에 긴 파일 하나만 남아 기다리는 시간을 줄이고,
+        결과는 끝나는 순서대로 yield 한다. 실패한 파일은 "error"에 메시지를 담고 나머지는 계속 처리.
+        """
+        audio_paths = list(audio_paths)
+
+        if workers <= 1 or len(audio_paths) <= 1:
+            for path in audio_paths:
+                yield _process_safely(self, path)
+            return
+
+        workers = min(workers, len(audio_paths))
+        threads = threads_per_worker or default_threads_per_worker(workers)
+        ordered = longest_first(audio_paths)
+        print(f"[process_many] files={len(ordered)}, workers={workers}, threads/worker={threads}")
+
+        with spawn_pool(workers, _init_worker, (threads, self.stt_agent.config())) as pool:
+            for result in pool.imap_unordered(_process_in_worker, ordered, chunksize=1):
+                yield result
+
+    def stream_audio(
+        self,
+        audio_path: str,
+        window_sec: float = STREAM_WINDOW_SEC,
+        buffer_windows: int = STREAM_BUFFER_WINDOWS,
+    ):
+        """
+        음성을 window_sec 단위 창으로 나눠 앞에서부터 인식하고,
+        끝난 segment마다 감정을 붙여서 바로 yield 하는 generator.
+
+            for seg in processor.stream_audio(path):
+                print(seg["start"], seg["end"], seg["text"], seg["emotion"])
+
+        STT는 백그라운드 스레드에서 최대 buffer_windows개 창까지만 미리 인식하고 기다린다.
+        yield 되는 dict: start / end(원본 기준 초), text, emotion, window_index, elapsed_sec
+        끝나면 self.last_stream_stats에 time_to_first_emotion_sec 등 통계가 남는다.
+        """
+        if not os.path.isfile(audio_path):
+            raise FileNotFoundError(f"파일을 찾을 수 없음: {audio_path}")
+
+        stream_start = time.perf_counter()
+        out = queue.Queue(maxsize=max(buffer_windows, 1))
+        stop = threading.Event()
+        errors = []
+
+        def put(item):
+            # 소비자가 generator를 닫으면 stop이 걸리므로 무한정 막히지 않게 주기적으로 확인
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def producer():
+            try:
+                for window in self._iter_stream_windows(audio_path, window_sec, stop):
+                    if not put(window):
+                        break
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(_DONE)
+
+        stats = {
+            "audio_path": audio_path,
+            "windows": 0,
+            "segments": 0,
+            "time_to_first_emotion_sec": None,
+            "total_sec": None,
+        }
+        self.last_stream_stats = stats
+
+        thread = threading.Thread(target=producer, name="stt-stream", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    break
+                window_index, segments = item
+                stats["windows"] += 1
+
+                segments = [seg for seg in segments if seg["text"]]
+                if not segments:
+                    continue
+
+                # 창 하나의 segment들은 한 번의 배치로 감정 예측
+                emotions = self.emotion_agent.predict_many([seg["text"] for seg in segments])
+                for seg, emotion in zip(segments, emotions):
+                    elapsed = time.perf_counter() - stream_start
+                    if stats["time_to_first_emotion_sec"] is None:
+                        stats["time_to_first_emotion_sec"] = elapsed
+                    stats["segments"] += 1
+                    yield {
+                        "start": seg["start"],
+                        "end": seg["end"],
+                        "text": seg["text"],
+                        "emotion": emotion,
+                        "window_index": window_index,
+                        "elapsed_sec": elapsed,
+                    }
+        finally:
+            stop.set()
+            thread.join()
+            stats["total_sec"] = time.perf_counter() - stream_start
+
+        if errors:
+            raise errors[0]
+
+    def _iter_stream_windows(self, audio_path, window_sec, stop):
+        """
+        (창 번호, [segment, ...])를 앞에서부터 yield.
+        마지막 창이 아니면 창 끝에 걸친 마지막 segment는 버리고 그 시작점부터 다음 창을 잡는다.
+        """
+        agent = self.stt_agent
+        audio = load_audio(audio_path)
+        total = len(audio)
+        window_len = int(window_sec * SAMPLE_RATE)
+
+        pos = 0
+        window_index = 0
+        prompt = None
+        while pos < total and not stop.is_set():
+            end = min(pos + window_len, total)
+            is_last = end >= total
+            offset = pos / SAMPLE_RATE
+
+            if agent.escalate_model is None:
+                result = transcribe_audio(
+                    agent.model,
+                    audio[pos:end],
+                    agent.dtype,
+                    agent.language,
+                    agent.vad,
+                    initial_prompt=prompt,
+                )
+            else:
+                # cascade가 켜져 있으면 창마다 자신 없는 segment만 큰 모델로 다시 인식
+                result = transcribe_cascade(
+                    agent.model,
+                    agent.escalate_model,
+                    audio[pos:end],
+                    agent.dtype,
+                    agent.language,
+                    agent.vad,
+                    agent.model_size,
+                    agent.escalate_size,
+                    initial_prompt=prompt,
+                )
+            segments = result["segments"]
+
+            next_pos = end
+            if not is_last and len(segments) > 1:
+                cut = segments[-1]["start"]
+                if cut >= _MIN_ADVANCE_SEC:
+                    segments = segments[:-1]
+                    next_pos = pos + int(cut * SAMPLE_RATE)
+
+            finished = [
+                {
+                    "start": offset + seg["start"],
+                    "end": offset + seg["end"],
+                    "text": seg["text"].strip(),
+                }
+                for seg in segments
+            ]
+            yield window_index, finished
+
+            text = " ".join(seg["text"] for seg in finished)
+            if text:
+                prompt = text[-_PROMPT_CHARS:]
+            pos = next_pos
+            window_index += 1
+
+
+def longest_first(audio_paths, catalog: AudioCatalog = None):
+    """
+    음성 길이가 긴 순서로 정렬.
+    길이는 audio_catalog에 저장된 duration을 먼저 쓰고, 없는 파일만 ffprobe로 잰다.
+    그래도 길이를 모르는 파일은 길이를 아는 파일들의 (바이트 / 초) 비율로 크기에서 추정한다.
+    """
+    audio_paths = list(audio_paths)
+    if catalog is None and os.path.isfile(DEFAULT_CATALOG_PATH):
+        catalog = AudioCatalog()
+
+    durations = {}
+    if catalog is not None:
+        known = catalog.durations(audio_paths)
+        durations = {p: known.get(os.path.abspath(p)) for p in audio_paths}
+
+    missing = [p for p in audio_paths if durations.get(p) is None]
+    durations.update(zip(missing, probe_durations(missing)))
+
+    sizes = {p: os.path.getsize(p) if os.path.isfile(p) else 0 for p in audio_paths}
+    measured = [p for p in audio_paths if durations[p] and sizes[p]]
+    bytes_per_sec = sum(sizes[p] for p in measured) / sum(durations[p] for p in measured) if measured else 1.0
+    for p in audio_paths:
+        if durations[p] is None:
+            durations[p] = sizes[p] / bytes_per_sec
+
+    return sorted(audio_paths, key=lambda p: durations[p], reverse=True)
+
+
+def _process_safely(processor, audio_path):
+    try:
+        return processor.process_audio(audio_path)
+    except Exception as e:
+        print(f"[process_many] 실패: {audio_path} ({e})")
+        return {"audio_path": audio_path, "text": "", "emotion": None, "error": f"{type(e).__name__}: {e}"}
+
+
+_worker_processor = None
+
+
+def _init_worker(num_threads, stt_config):
+    """워커 프로세스 시작 시 1번 실행: 스레드 예산을 정하고 부모와 같은 STT 설정으로 Whisper / KoBERT를 미리 로드"""
+    global _worker_processor
+
+    limit_threads(num_threads)
+
+    from emotion_infer import get_emotion_model
+
+    stt_config = dict(stt_config)
+    _worker_processor = CallcenterAudioProcessor(
+        stt_device=stt_config.pop("device"),
+        stt_model_size=stt_config.pop("model_size"),
+        **stt_config,
+    )
+    get_emotion_model().load()
+    print(f"[worker {os.getpid()}] ready (threads={num_threads})")
+
+
+def _process_in_worker(audio_path):
+    return _process_safely(_worker_processor, audio_path)
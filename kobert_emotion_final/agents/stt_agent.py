@@ -1,15 +1,82 @@
 # kobert_emotion_final/agents/stt_agent.py
-import whisper
+from stt_infer import (
+    DEFAULT_CACHE,
+    DEFAULT_CASCADE,
+    DEFAULT_LANGUAGE,
+    DEFAULT_MODEL_SIZE,
+    DEFAULT_VAD,
+    get_cache,
+    get_whisper_model,
+    resolve_device,
+    resolve_dtype,
+    transcribe_file,
+)
 
 class STTAgent:
-    def __init__(self, device="mps"):
-        print("[STTAgent] Whisper 모델 로딩 중...")
-        self.model = whisper.load_model("small", device=device)
+    def __init__(
+        self,
+        device=None,
+        model_size=None,
+        dtype=None,
+        language=DEFAULT_LANGUAGE,
+        vad=DEFAULT_VAD,
+        use_cache=DEFAULT_CACHE,
+        cascade=DEFAULT_CASCADE,
+    ):
+        """
+        device=None이면 cuda → mps → cpu 중 자동 선택.
+        Whisper 모델은 stt_infer 레지스트리에서 공유하므로 agent를 여러 개 만들어도 1번만 로드된다.
+        vad=True면 무음 / 대기 구간을 잘라내고 말소리 구간만 인식한다.
+        use_cache=True면 같은 내용의 파일은 디스크 캐시(stt_cache)에서 결과를 바로 가져온다.
+        cascade=("base", "small") 처럼 주면 model_size 대신 앞 모델로 먼저 인식하고
+        자신 없는 segment만 뒤 모델로 다시 인식한다.
+        """
+        self.device = resolve_device(device)
+        self.dtype = resolve_dtype(self.device, dtype)
+        self.language = language
+        self.vad = vad
+        self.escalate_size = None
+        self.escalate_model = None
+        if cascade:
+            model_size, self.escalate_size = cascade
+            self.escalate_model = get_whisper_model(self.escalate_size, self.device, self.dtype)
+        self.model_size = model_size or DEFAULT_MODEL_SIZE
+        self.model = get_whisper_model(self.model_size, self.device, self.dtype)
+        self.cache = get_cache() if use_cache else None
 
-    def run(self, audio_path: str) -> str:
-        result = self.model.transcribe(
-            audio_path,
-            language="ko",
-            fp16=False,
+    def config(self) -> dict:
+        """같은 설정의 STTAgent를 다시 만들 수 있는 생성자 인자 (워커 프로세스로 넘길 때 사용)"""
+        return {
+            "device": self.device,
+            "model_size": self.model_size,
+            "dtype": self.dtype,
+            "language": self.language,
+            "vad": self.vad,
+            "use_cache": self.cache is not None,
+            "cascade": (self.model_size, self.escalate_size) if self.escalate_model is not None else None,
+        }
+
+    def transcribe(self, audio_path: str) -> dict:
+        """whisper 결과 dict 전체 (text / segments, vad=True면 vad 통계 포함)"""
+        result = transcribe_file(
+            self.model, audio_path, self.model_size, self.dtype, self.language, self.vad, self.cache,
+            self.escalate_model, self.escalate_size,
         )
-        return result["text"]
+        if "vad" in result:
+            stats = result["vad"]
+            print(
+                f"[STTAgent] VAD: {stats['speech_sec']:.1f}s / {stats['total_sec']:.1f}s 인식"
+                f" ({stats['skipped_fraction'] * 100:.1f}% 건너뜀, 구간 {stats['num_regions']}개)"
+            )
+        if "cascade" in result:
+            stats = result["cascade"]
+            saved = stats["compute_saved"]
+            print(
+                f"[STTAgent] cascade {' → '.join(stats['models'])}: "
+                f"{stats['escalated']}/{stats['segments']} segment escalate"
+                + (f", 연산량 약 {saved * 100:.0f}% 절약" if saved is not None else "")
+            )
+        return result
+
+    def run(self, audio_path: str) -> str:
+        return self.transcribe(audio_path)["text"]
@@ -1,13 +1,225 @@
 # kobert_emotion_final/agents/emotion_agent.py
-from emotion_infer import predict_emotion
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from emotion_infer import predict_emotions
 
 class EmotionAgent:
     def predict(self, text: str) -> dict:
         """
         한 문장(text)에 대한 감정 예측을 dict로 반환
         """
-        label, score = predict_emotion(text)
+        return self.predict_many([text])[0]
+
+    def predict_many(self, texts) -> list:
+        """
+        여러 문장을 배치로 한 번에 예측해서 dict 리스트로 반환 (입력 순서 유지)
+        """
+        return [
+            {
+                "emotion_label": label,
+                "emotion_score": score,
+            }
+            for label, score in predict_emotions(texts)
+        ]
+
+
+# 큐에서 아무것도 못 꺼냈을 때 / 종료 신호
+_EMPTY = object()
+_STOP = object()
+
+
+def _fail_closed(future):
+    if not future.done():
+        future.set_exception(RuntimeError("AsyncEmotionAgent가 닫혀서 요청을 처리하지 못함"))
+
+
+class AsyncEmotionAgent:
+    """
+    asyncio용 micro-batching 감정 분석 agent.
+
+    동시에 들어온 predict() 요청들을 큐에 모아 두었다가
+    max_wait_ms 동안 또는 max_batch_size개가 찰 때까지 기다린 뒤
+    한 번의 배치 forward로 처리하고, 각 요청의 future에 자기 결과를 돌려준다.
+    모델은 전용 executor 스레드 1개에서 돌아서 이벤트 루프를 막지 않는다.
+
+        async with AsyncEmotionAgent() as agent:
+            result = await agent.predict("환불해 주세요")
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 1024,
+        timeout: float = None,
+        agent: EmotionAgent = None,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size   # 꽉 차면 predict()가 자리가 날 때까지 대기
+        self.timeout = timeout                 # 요청 1개당 기본 타임아웃(초), None이면 무제한
+        self.agent = agent or EmotionAgent()
+
+        self._queue = None
+        self._runner = None
+        self._get_task = None
+        self._executor = None
+        self._closed = False    # close()가 불린 뒤에는 새 요청을 받지 않음
+        self._stopped = False   # 배치 루프가 끝남 (큐에 남은 요청은 실패 처리)
+
+        # 메트릭
+        self.num_requests = 0
+        self.num_batches = 0
+        self.num_batched_items = 0
+        self.num_timeouts = 0
+        self.max_batch_seen = 0
+        self.max_queue_depth = 0
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """배치 처리 루프 시작 (predict()를 처음 부를 때 자동으로 호출됨)"""
+        if self._runner is not None:
+            return
+        self._closed = False
+        self._stopped = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="emotion-batch")
+        self._runner = asyncio.create_task(self._run())
+
+    async def close(self):
+        """
+        close() 전에 큐에 들어온 요청까지 처리한 뒤 루프와 executor를 정리.
+        그 뒤에 들어온 요청(종료 신호 뒤에 쌓인 것, 큐가 꽉 차서 기다리던 것)은 RuntimeError로 실패시킨다.
+        """
+        if self._runner is None or self._closed:
+            return
+        self._closed = True
+        queue = self._queue
+        await queue.put(_STOP)
+        await self._runner
+
+        self._stopped = True
+        if self._get_task is not None:
+            self._get_task.cancel()
+            self._get_task = None
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not _STOP:
+                _fail_closed(item[1])
+
+        self._executor.shutdown(wait=True)
+        self._runner = None
+        self._queue = None
+
+    async def predict(self, text: str, timeout: float = None) -> dict:
+        """
+        한 문장 감정 예측. 다른 요청들과 묶여서 배치로 처리된다.
+        timeout(초) 안에 큐에 못 넣거나 결과가 안 나오면 asyncio.TimeoutError.
+        """
+        if self._closed:
+            raise RuntimeError("AsyncEmotionAgent가 이미 닫혔음")
+        if self._runner is None:
+            await self.start()
+
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else loop.time() + timeout
+        future = loop.create_future()
+
+        try:
+            # 큐가 꽉 차 있으면 여기서 기다림 (backpressure)
+            await asyncio.wait_for(queue.put((text, future)), timeout)
+            if self._stopped:
+                # 기다리는 사이 close()가 끝났으면 이 요청을 처리할 루프가 없다
+                _fail_closed(future)
+            self.num_requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, queue.qsize())
+
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            return await asyncio.wait_for(future, remaining)
+        except asyncio.TimeoutError:
+            # 취소된 future는 배치 루프에서 건너뛴다
+            future.cancel()
+            self.num_timeouts += 1
+            raise
+
+    def metrics(self) -> dict:
         return {
-            "emotion_label": label,
-            "emotion_score": score,
+            "requests": self.num_requests,
+            "batches": self.num_batches,
+            "avg_batch_size": self.num_batched_items / self.num_batches if self.num_batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "timeouts": self.num_timeouts,
         }
+
+    async def _next_item(self, timeout):
+        """
+        큐에서 하나 꺼낸다. timeout 안에 없으면 _EMPTY.
+        get()을 취소하지 않고 다음 호출에서 이어서 기다려서 요청이 유실되지 않게 한다.
+        """
+        if self._get_task is None:
+            self._get_task = asyncio.ensure_future(self._queue.get())
+
+        done, _ = await asyncio.wait({self._get_task}, timeout=timeout)
+        if not done:
+            return _EMPTY
+
+        item = self._get_task.result()
+        self._get_task = None
+        return item
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._next_item(None)
+            if item is _STOP:
+                break
+
+            # 첫 요청이 온 뒤 max_wait 동안 또는 배치가 찰 때까지 더 모은다
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                item = await self._next_item(max(deadline - loop.time(), 0))
+                if item is _EMPTY:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # 이미 타임아웃/취소된 요청은 빼고 돌린다
+            batch = [(text, fut) for text, fut in batch if not fut.done()]
+            if not batch:
+                continue
+
+            self.num_batches += 1
+            self.num_batched_items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+            try:
+                preds = await loop.run_in_executor(
+                    self._executor,
+                    self.agent.predict_many,
+                    [text for text, _ in batch],
+                )
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            for (_, fut), pred in zip(batch, preds):
+                if not fut.done():
+                    fut.set_result(pred)
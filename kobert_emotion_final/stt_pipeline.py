@@ -1,6 +1,8 @@
 import os
 import glob
-import whisper
+import argparse
+from stt_infer import DEFAULT_AUDIO_CACHE, DEFAULT_CACHE, DEFAULT_VAD, get_cache, transcribe, transcribe_many
+from audio_catalog import AudioCatalog
 from emotion_infer import (
     predict_emotions_by_utterance,
     get_last_customer_emotion,
@@ -17,32 +19,74 @@ def find_child(parent, keyword):
 
 DOWNLOADS = os.path.expanduser("~/Downloads")
 
-# 단계별 탐색
-step1 = find_child(DOWNLOADS, "022.")
-step2 = find_child(step1, "01.")
-step3 = find_child(step2, "Validation")
-step4 = find_child(step3, "원천데이터")
-AUDIO_DIR = find_child(step4, "쇼핑")
+AUDIO_SPLIT = "Validation"
+AUDIO_DOMAIN = "쇼핑"
 
-print("AUDIO_DIR:", AUDIO_DIR)
-print("AUDIO_DIR exists?:", os.path.isdir(AUDIO_DIR))
 
-
-# Whisper 모델 로드
-device = "mps"  # 안 되면 "cpu"
-whisper_model = whisper.load_model("small", device=device)
+def find_audio_root():
+    """
+    ~/Downloads 아래에서 단계별로 원천데이터 폴더를 찾는다 (폴더 몇 개만 listdir 하므로 매번 호출해도 가벼움).
+    환경변수 AUDIO_ROOT로 직접 지정 가능.
+    """
+    if os.environ.get("AUDIO_ROOT"):
+        return os.environ["AUDIO_ROOT"]
+    step1 = find_child(DOWNLOADS, "022.")
+    step2 = find_child(step1, "01.")
+    step3 = find_child(step2, AUDIO_SPLIT)
+    return find_child(step3, "원천데이터")
 
 
-def stt_whisper(audio_path: str) -> str:
+def list_audio_files(catalog: AudioCatalog = None, domain: str = AUDIO_DOMAIN, refresh: bool = True):
+    """
+    카탈로그(audio_catalog)에서 find_audio_root() 아래 domain 폴더의 음성 파일 목록을 가져온다.
+    refresh=True면 mtime이 바뀐 폴더만 다시 읽어서 카탈로그를 갱신한 뒤 조회한다.
+    (카탈로그에 다른 폴더가 등록돼 있어도 여기서는 찾은 원천데이터 폴더만 본다)
+    """
+    catalog = catalog or AudioCatalog()
+    root = find_audio_root()
+    if refresh:
+        stats = catalog.refresh(root)
+        print(
+            f"[CATALOG] {root}: 폴더 {stats['dirs_checked']}개 확인 / {stats['dirs_scanned']}개 다시 읽음,"
+            f" +{stats['files_added']} -{stats['files_removed']} ({stats['seconds']:.1f}s)"
+        )
+
+    paths = catalog.paths(domain=domain, root=root)
+    if not paths:
+        domains = sorted({row["domain"] for row in catalog.summary() if row["domain"]})
+        raise FileNotFoundError(
+            f"'{domain}' 를 포함한 폴더의 음성 파일이 카탈로그에 없음 (root={root}, 있는 폴더: {domains})"
+        )
+    return paths
+
+
+def stt_whisper(audio_path: str, vad: bool = DEFAULT_VAD) -> str:
+    # Whisper 모델은 첫 호출 때 stt_infer 레지스트리에서 1번만 로드 (device 자동 선택)
     print(f"\n[STT] {os.path.basename(audio_path)}")
-    result = whisper_model.transcribe(
-        audio_path,
-        language="ko",
-        fp16=False,
-    )
+    result = transcribe(audio_path, language="ko", vad=vad)
+    if "vad" in result:
+        print(f"[VAD] {result['vad']['skipped_fraction'] * 100:.1f}% 건너뜀 "
+              f"({result['vad']['speech_sec']:.1f}s / {result['vad']['total_sec']:.1f}s)")
     return result["text"]
 
 
+def iter_transcripts(audio_files, batched: bool = False):
+    """
+    (음성 경로, 텍스트 또는 None, 에러 메시지 또는 None)를 파일 순서대로 yield.
+    기본은 파일마다 stt_whisper (whisper.transcribe: temperature fallback, STT_VAD 적용).
+    batched=True면 여러 파일의 30초 창을 묶어서 greedy 배치 디코딩 (stt_infer.transcribe_many).
+    처리량은 높지만 VAD / temperature fallback이 없어서 결과가 조금 다를 수 있다.
+    """
+    if not batched:
+        for audio_path in audio_files:
+            yield audio_path, stt_whisper(audio_path), None
+        return
+
+    for audio_path, result in transcribe_many(audio_files, language="ko"):
+        print(f"\n[STT] {os.path.basename(audio_path)} (batched)")
+        yield audio_path, result["text"], result.get("error")
+
+
 def split_sentences_korean(text: str):
     """
     Whisper 결과를 단순 문장 단위로 분리하는 함수.
@@ -58,26 +102,32 @@ def split_sentences_korean(text: str):
 
 
 def main():
-    # 다수의 m4a 찾기
-    audio_files = []
-    for root, dirs, files in os.walk(AUDIO_DIR):
-        for f in files:
-            if f.lower().endswith(".m4a"):
-                audio_files.append(os.path.join(root, f))
+    parser = argparse.ArgumentParser(description="원천데이터 음성 → STT → 고객 감정")
+    parser.add_argument("--limit", type=int, default=3, help="처리할 파일 수")
+    parser.add_argument("--batched", action="store_true",
+                        help="여러 파일을 묶어서 배치 디코딩 (처리량 위주, VAD / temperature fallback 없음)")
+    args = parser.parse_args()
+    if args.batched and DEFAULT_VAD:
+        parser.error("--batched 모드는 VAD를 지원하지 않습니다 (STT_VAD를 끄고 실행)")
+
+    # 다수의 m4a 찾기 (카탈로그에서 조회, 바뀐 폴더만 다시 스캔)
+    try:
+        audio_files = list_audio_files()
+    except FileNotFoundError as e:
+        print("❗ m4a 파일이 없습니다.", e)
+        return
 
     print("\n찾은 음성 파일 개수:", len(audio_files))
     print("샘플 5개:")
     for p in audio_files[:5]:
         print(" -", p)
 
-    if not audio_files:
-        print("❗ m4a 파일이 없습니다.")
-        return
-
     # STT + 감정
-    for audio_path in audio_files[:3]:  # 일단 3개만
-        # 1) STT
-        text = stt_whisper(audio_path)
+    # 1) STT (--batched면 여러 파일을 묶어서 배치 디코딩), 결과는 파일 순서대로 나온다
+    for audio_path, text, error in iter_transcripts(audio_files[:args.limit], args.batched):
+        if error:
+            print("❗ STT 실패:", error)
+            continue
         print("[TEXT PREVIEW]:", text[:150], "...")
 
         # 2) 문장 단위로 split
@@ -107,6 +157,12 @@ def main():
         print("\n[마지막 고객 발화 감정]")
         print(last)
 
+    if DEFAULT_CACHE:
+        print("\n[STT CACHE]", get_cache().stats())
+    if DEFAULT_AUDIO_CACHE:
+        from stt_cache import get_audio_cache
+        print("[AUDIO CACHE]", get_audio_cache().stats())
+
 
 if __name__ == "__main__":
     main()
@@ -23,3 +23,20 @@ if __name__ == "__main__":
     print("\n=== FINAL RESULT ===")
     print("📌 텍스트 일부:", result["text"][:120], "...")
     print("📌 감정:", result["emotion"])
+
+    # 스트리밍 모드: 창 단위로 인식하면서 segment마다 감정을 바로 출력
+    print("\n=== STREAMING ===")
+    for seg in processor.stream_audio(audio_path):
+        print(
+            f"[{seg['start']:6.1f}s ~ {seg['end']:6.1f}s] {seg['emotion']['emotion_label']}"
+            f" ({seg['emotion']['emotion_score']:.3f}) | {seg['text']}"
+        )
+
+    stats = processor.last_stream_stats
+    first = stats["time_to_first_emotion_sec"]
+    print(
+        f"\n⏱ time to first emotion: {first:.2f}s" if first is not None else "\n⏱ 인식된 발화 없음"
+    )
+    print(
+        f"전체 {stats['total_sec']:.2f}s (창 {stats['windows']}개, segment {stats['segments']}개)"
+    )
@@ -20,7 +20,7 @@ def process_audio(audio_path: str):
       1) STT로 전체 텍스트 뽑고
       2) 그 텍스트에 대한 감정 1개 예측
     """
-    stt = STTAgent(device="mps")       # 안 되면 "cpu"
+    stt = STTAgent()                   # device 자동 선택, 모델은 공유 레지스트리에서 재사용
     emotion_agent = EmotionAgent()
 
     text = stt.run(audio_path)
@@ -9,7 +9,7 @@ def main():
     print("[TEST] audio_path:", audio_path)
     print("[EXISTS?]", os.path.exists(audio_path))
 
-    stt = STTAgent(device="mps")  # 안 되면 "cpu"
+    stt = STTAgent()  # device 자동 선택 (cuda → mps → cpu)
     text = stt.run(audio_path)
 
     print("\n[STT RESULT]")
@@ -0,0 +1,515 @@
+# aihub_io.py
+#
+# run_aihub_* 배치 스크립트용 입출력 헬퍼.
+
+import os
+import csv
+import json
+import hashlib
+from functools import partial
+
+READ_CHUNK_SIZE = 1 << 16   # 64KB씩 읽기
+
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(path: str, chunk_size: int = READ_CHUNK_SIZE):
+    """
+    최상단이 리스트인 JSON 파일에서 원소(row)를 하나씩 yield.
+
+    json.load처럼 파일 전체를 메모리에 올리지 않고 chunk_size씩 읽어가며
+    원소 하나 단위로 디코딩하므로, 파일 크기와 상관없이 메모리는
+    '원소 하나 + chunk 하나' 정도만 쓴다.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8-sig") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            # 이미 처리한 앞부분은 버리고 다음 chunk를 이어 붙인다
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf = buf[pos:] + chunk
+            pos = 0
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        skip_ws()
+        if pos >= len(buf) or buf[pos] != "[":
+            raise ValueError(f"최상단이 JSON 배열이 아님: {path}")
+        pos += 1
+
+        skip_ws()
+        if pos < len(buf) and buf[pos] == "]":
+            return
+
+        while True:
+            skip_ws()
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # 버퍼 끝에서 끝난 값은 잘린 숫자일 수 있으니 더 읽어서 확인
+                incomplete = end >= len(buf) and not eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                incomplete = True
+
+            if incomplete:
+                fill()
+                continue
+
+            pos = end
+            yield item
+
+            skip_ws()
+            if pos >= len(buf):
+                raise ValueError(f"JSON 배열이 닫히지 않음: {path}")
+            if buf[pos] == "]":
+                return
+            if buf[pos] != ",":
+                raise ValueError(f"JSON 배열 구분자 오류 (위치 {pos}): {path}")
+            pos += 1
+
+
+# ───────────────────────────────────────────────
+# 결과 저장 (배치마다 바로 flush) + 완료 파일 manifest
+# ───────────────────────────────────────────────
+TEXT_FORMATS = ("csv", "jsonl")
+
+HASH_CHUNK_SIZE = 1 << 20   # 1MB씩 읽어서 해시
+
+
+class ResultSink:
+    """
+    결과 row를 받는 즉시 CSV / JSONL 파일에 써서 flush 하는 출력기.
+    전체 결과를 리스트에 모아 두지 않으므로 메모리가 데이터 크기와 무관하다.
+
+    truncate_at이 주어지면 기존 파일을 그 바이트 위치까지 잘라낸 뒤 이어서 쓴다
+    (--resume 때 마지막으로 완료 기록된 지점 뒤의 반쯤 쓴 결과를 버리기 위함).
+    """
+
+    def __init__(self, path: str, fieldnames, fmt: str = "csv", truncate_at: int = None):
+        if fmt not in TEXT_FORMATS:
+            raise ValueError(f"지원하지 않는 출력 형식: {fmt!r} (가능: {TEXT_FORMATS})")
+
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.fmt = fmt
+        self.num_rows = 0
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        if truncate_at is not None and os.path.exists(path):
+            with open(path, "r+b") as f:
+                f.truncate(truncate_at)
+            mode = "a"
+        else:
+            mode = "w"
+
+        self._f = open(path, mode, encoding="utf-8", newline="")
+        if fmt == "csv":
+            # fieldnames에 없는 키(예: 파티션용 split)는 쓰지 않는다
+            self._writer = csv.DictWriter(self._f, fieldnames=self.fieldnames, extrasaction="ignore")
+            if self._f.tell() == 0:
+                self._writer.writeheader()
+                self._f.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_rows(self, rows):
+        """row들을 쓰고 바로 flush"""
+        if self.fmt == "csv":
+            self._writer.writerows(rows)
+        else:
+            for row in rows:
+                row = {k: row.get(k) for k in self.fieldnames}
+                self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.num_rows += len(rows)
+
+    def tell(self) -> int:
+        """지금까지 쓴 파일 크기(바이트)"""
+        self._f.flush()
+        return self._f.tell()
+
+    def after_flush(self, callback):
+        """지금까지 쓴 row가 디스크에 반영되면 callback(tell()) 호출 (이 sink는 매번 flush 하므로 즉시)"""
+        callback(self.tell())
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+
+# ───────────────────────────────────────────────
+# 컬럼 포맷(Parquet / Arrow IPC) 출력
+# ───────────────────────────────────────────────
+COLUMNAR_FORMATS = ("parquet", "arrow")
+SINK_FORMATS = TEXT_FORMATS + COLUMNAR_FORMATS
+
+# 폴더 단위로 나눌 컬럼 (hive 스타일: split=train/domain=쇼핑/part-000000.parquet)
+PARTITION_COLUMNS = ("split", "domain")
+
+# 문자열이지만 값 종류가 적어서 dictionary 인코딩하는 컬럼
+DICTIONARY_COLUMNS = ("split", "file", "call_id", "domain", "category", "category1", "speaker", "emotion")
+INT_COLUMNS = ("customer_turn_index", "raw_turn_index")
+# score, prob_* 는 float32
+
+PART_FILE_PREFIX = "part-"
+ROWS_PER_PART = 200_000
+
+
+def _partition_value(value) -> str:
+    value = str(value or "")
+    if not value:
+        return "__HIVE_DEFAULT_PARTITION__"
+    return value.replace(os.sep, "_")
+
+
+class ColumnarSink:
+    """
+    결과를 Parquet 또는 Arrow IPC 파일들로 저장하는 출력기 (pyarrow 필요).
+
+    output_path는 폴더이고, split / domain 값에 따라 하위 폴더로 나눠서
+    part-000000.parquet 처럼 순번이 붙은 파일로 쓴다.
+    라벨/카테고리 컬럼은 dictionary 인코딩, score와 확률은 float32로 저장한다.
+
+    row는 rows_per_part개가 모일 때까지 버퍼에 두었다가 한 번에 part 파일로 쓰고,
+    tell()은 '지금까지 다 쓴 part 파일 수'를 돌려준다 (버퍼는 내보내지 않음).
+    입력 파일 완료 기록은 after_flush()로 맡겨 두면 그 row들이 part 파일로 나간 뒤에 남는다.
+    truncate_at이 주어지면 그 번호 이후의 part 파일(완료 기록 뒤에 쓴 것)을 지우고 이어쓴다.
+    """
+
+    def __init__(self, path: str, fieldnames, fmt: str = "parquet", truncate_at: int = None,
+                 rows_per_part: int = ROWS_PER_PART):
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"지원하지 않는 출력 형식: {fmt!r} (가능: {COLUMNAR_FORMATS})")
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("parquet / arrow 출력에는 pyarrow가 필요합니다: pip install pyarrow")
+
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.fmt = fmt
+        self.rows_per_part = rows_per_part
+        self.partition_columns = [c for c in PARTITION_COLUMNS if c in self.fieldnames]
+        self.data_columns = [c for c in self.fieldnames if c not in self.partition_columns]
+        self.num_rows = 0
+
+        self._buffers = {}   # 파티션 값 tuple → row 리스트
+        self._buffered = 0
+        self._next_part = 0
+        self._on_flush = []  # 버퍼가 part 파일로 나간 뒤 부를 callback들
+
+        existing = self._existing_parts()
+        if truncate_at is not None:
+            for part_no, part_path in existing:
+                if part_no >= truncate_at:
+                    os.remove(part_path)
+            self._next_part = truncate_at
+        else:
+            for _, part_path in existing:
+                os.remove(part_path)
+        os.makedirs(path, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def extension(self):
+        return ".parquet" if self.fmt == "parquet" else ".arrow"
+
+    def _existing_parts(self):
+        parts = []
+        if not os.path.isdir(self.path):
+            return parts
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.startswith(PART_FILE_PREFIX) and name.endswith(self.extension):
+                    part_no = int(name[len(PART_FILE_PREFIX):-len(self.extension)])
+                    parts.append((part_no, os.path.join(root, name)))
+        return parts
+
+    def write_rows(self, rows):
+        for row in rows:
+            key = tuple(_partition_value(row.get(c)) for c in self.partition_columns)
+            self._buffers.setdefault(key, []).append(row)
+        self._buffered += len(rows)
+        self.num_rows += len(rows)
+
+        if self._buffered >= self.rows_per_part:
+            self.flush()
+
+    def _schema(self):
+        import pyarrow as pa
+
+        fields = []
+        for c in self.data_columns:
+            if c in INT_COLUMNS:
+                fields.append(pa.field(c, pa.int32()))
+            elif c == "score" or c.startswith("prob_"):
+                fields.append(pa.field(c, pa.float32()))
+            elif c in DICTIONARY_COLUMNS:
+                fields.append(pa.field(c, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                fields.append(pa.field(c, pa.string()))
+        return pa.schema(fields)
+
+    def _to_table(self, rows):
+        import pyarrow as pa
+
+        schema = self._schema()
+        arrays = []
+        for field in schema:
+            values = [row.get(field.name) for row in rows]
+            if pa.types.is_dictionary(field.type):
+                values = [None if v is None else str(v) for v in values]
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def flush(self):
+        """버퍼에 있는 row들을 파티션별 part 파일로 내보내고 after_flush로 맡긴 callback을 부른다."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for key, rows in self._buffers.items():
+            part_dir = os.path.join(
+                self.path,
+                *(f"{c}={v}" for c, v in zip(self.partition_columns, key)),
+            )
+            os.makedirs(part_dir, exist_ok=True)
+            part_path = os.path.join(part_dir, f"{PART_FILE_PREFIX}{self._next_part:06d}{self.extension}")
+            table = self._to_table(rows)
+
+            if self.fmt == "parquet":
+                pq.write_table(table, part_path, compression="zstd")
+            else:
+                with pa.OSFile(part_path, "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            self._next_part += 1
+
+        self._buffers = {}
+        self._buffered = 0
+
+        callbacks, self._on_flush = self._on_flush, []
+        for callback in callbacks:
+            callback(self._next_part)
+
+    def tell(self) -> int:
+        """지금까지 다 쓴 part 파일 수 (resume 체크포인트 위치, 버퍼에 있는 row는 포함 안 됨)"""
+        return self._next_part
+
+    def after_flush(self, callback):
+        """지금 버퍼에 있는 row들이 part 파일로 나간 뒤 callback(tell()) 호출"""
+        if self._buffered:
+            self._on_flush.append(callback)
+        else:
+            callback(self.tell())
+
+    def close(self):
+        self.flush()
+
+
+def file_fingerprint(path: str, with_hash: bool = True) -> dict:
+    """입력 파일의 size / mtime / (sha1) — 다시 돌릴 때 바뀌었는지 확인용"""
+    st = os.stat(path)
+    info = {"size": st.st_size, "mtime": st.st_mtime}
+    if with_hash:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        info["sha1"] = h.hexdigest()
+    return info
+
+
+class RunManifest:
+    """
+    배치 실행 체크포인트.
+    처리가 끝난 입력 파일들의 fingerprint(size / mtime / sha1)와
+    그 시점의 출력 파일 크기를 JSON으로 기록한다.
+    출력 컬럼(fieldnames)과 형식도 같이 남겨서 --resume 때 설정이 바뀌었는지 확인한다.
+
+    파일 하나의 결과가 sink에 전부 flush 된 뒤에만 mark_done()을 부르므로 (sink.after_flush),
+    중간에 죽어도 manifest에 있는 파일들의 결과는 출력 파일의 output_bytes 앞부분에 온전히 있다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+        self.output_bytes = 0
+        self.fieldnames = None
+        self.format = None
+
+    @classmethod
+    def for_output(cls, output_path: str):
+        return cls(output_path + ".manifest.json")
+
+    def load(self):
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.output_bytes = data.get("output_bytes", 0)
+            self.fieldnames = data.get("fieldnames")
+            self.format = data.get("format")
+        return self
+
+    def changed_files(self):
+        """완료로 기록됐지만 그 뒤로 내용이 바뀐 입력 파일들 (지워진 파일은 제외)"""
+        return [p for p in self.files if os.path.isfile(p) and not self.is_done(p)]
+
+    def is_done(self, input_path: str) -> bool:
+        """이전 실행에서 이미 끝낸 파일이고, 그 뒤로 내용이 안 바뀌었으면 True"""
+        done = self.files.get(os.path.abspath(input_path))
+        if done is None:
+            return False
+
+        now = file_fingerprint(input_path, with_hash=False)
+        if now["size"] != done["size"]:
+            return False
+        if now["mtime"] == done["mtime"]:
+            return True
+        # mtime만 바뀐 경우(복사/touch)에는 해시로 확인
+        return file_fingerprint(input_path)["sha1"] == done.get("sha1")
+
+    def mark_done(self, input_path: str, num_rows: int, output_bytes: int, fingerprint: dict = None):
+        """fingerprint는 처리를 끝낸 시점에 떠 둔 file_fingerprint (없으면 지금 계산)"""
+        info = dict(fingerprint or file_fingerprint(input_path))
+        info["rows"] = num_rows
+        self.files[os.path.abspath(input_path)] = info
+        self.output_bytes = output_bytes
+        self.save()
+
+    def save(self):
+        # 쓰다가 죽어도 manifest가 깨지지 않게 임시 파일에 쓰고 교체
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": self.format,
+                    "fieldnames": self.fieldnames,
+                    "output_bytes": self.output_bytes,
+                    "files": self.files,
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        os.replace(tmp_path, self.path)
+
+
+def write_file_batches(file_batches, sink, manifest: RunManifest = None) -> int:
+    """
+    (입력 파일, row 배치 iterator)들을 받아 배치마다 sink에 쓰고,
+    파일 하나가 끝나면 그 결과가 sink에서 flush 된 뒤 manifest에 완료로 기록한다. 쓴 row 수를 반환.
+    """
+    total = 0
+    for path, batches in file_batches:
+        num_rows = 0
+        for rows in batches:
+            sink.write_rows(rows)
+            num_rows += len(rows)
+        if manifest is not None:
+            mark_done_after_flush(sink, manifest, path, num_rows)
+        total += num_rows
+    return total
+
+
+def mark_done_after_flush(sink, manifest: RunManifest, path: str, num_rows: int):
+    """path의 결과 row들이 sink에서 디스크로 나간 뒤 manifest에 완료로 기록하도록 맡겨 둔다"""
+    fingerprint = file_fingerprint(path)
+    sink.after_flush(partial(manifest.mark_done, path, num_rows, fingerprint=fingerprint))
+
+
+def open_sink(output_path: str, fieldnames, fmt: str = "csv", resume: bool = False):
+    """
+    (ResultSink 또는 ColumnarSink, RunManifest) 생성.
+    parquet / arrow 형식이면 output_path는 파일이 아니라 폴더로 쓰인다.
+    resume이면 manifest를 읽어서 마지막 완료 지점까지 출력 파일을 자르고 이어쓴다.
+    아니면 출력 파일과 manifest를 새로 시작한다.
+
+    이어쓰면 결과가 깨지는 경우에는 resume을 거부하고 ValueError / FileNotFoundError를 낸다:
+    출력 형식이나 컬럼(--with-probs 등)이 바뀐 경우, 출력 파일이 없어진 경우,
+    완료된 입력 파일의 내용이 바뀐 경우 (이전 결과 row를 골라서 지울 수 없으므로).
+    """
+    manifest = RunManifest.for_output(output_path)
+    fieldnames = list(fieldnames)
+    truncate_at = None
+
+    if resume:
+        manifest.load()
+        if manifest.files:
+            check_resumable(manifest, output_path, fieldnames, fmt)
+            truncate_at = manifest.output_bytes
+            print(f"[RESUME] 이미 끝난 파일 {len(manifest.files)}개 건너뜀 (manifest: {manifest.path})")
+
+    if fmt in COLUMNAR_FORMATS:
+        sink = ColumnarSink(output_path, fieldnames, fmt=fmt, truncate_at=truncate_at)
+    else:
+        sink = ResultSink(output_path, fieldnames, fmt=fmt, truncate_at=truncate_at)
+    if truncate_at is None:
+        manifest.files = {}
+        manifest.output_bytes = sink.tell()
+    manifest.fieldnames = fieldnames
+    manifest.format = fmt
+    manifest.save()
+    return sink, manifest
+
+
+def _csv_header(path: str):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), None)
+
+
+def check_resumable(manifest: RunManifest, output_path: str, fieldnames, fmt: str):
+    """manifest대로 이어써도 되는지 확인하고, 안 되면 이유를 담아 예외를 낸다"""
+    hint = "--resume 없이 처음부터 다시 실행하세요."
+    if not os.path.exists(output_path):
+        raise FileNotFoundError(
+            f"manifest에는 완료 파일 {len(manifest.files)}개가 있는데 출력이 없음: {output_path}. {hint}"
+        )
+
+    if manifest.format is not None and manifest.format != fmt:
+        raise ValueError(f"이전 출력 형식({manifest.format})과 지금 형식({fmt})이 다름. {hint}")
+
+    # 예전 manifest에는 fieldnames가 없으므로 CSV는 헤더로 확인
+    previous = manifest.fieldnames
+    if previous is None and fmt == "csv":
+        previous = _csv_header(output_path)
+    if previous is not None and list(previous) != list(fieldnames):
+        raise ValueError(
+            f"이전 출력 컬럼과 지금 컬럼이 다름 (--with-probs 등 확인). 이전: {previous}, 지금: {list(fieldnames)}. {hint}"
+        )
+
+    changed = manifest.changed_files()
+    if changed:
+        raise ValueError(
+            f"완료된 뒤 내용이 바뀐 입력 파일 {len(changed)}개 (예: {changed[0]}) — "
+            f"이어쓰면 이전 결과와 중복됨. {hint}"
+        )
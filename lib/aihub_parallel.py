@@ -0,0 +1,75 @@
+# aihub_parallel.py
+#
+# run_aihub_* 배치 스크립트용 멀티 프로세스 실행 헬퍼.
+# 입력 json 파일들을 N개 워커 프로세스에 나눠서 처리하고,
+# 결과는 워커 수와 상관없이 항상 입력 파일 순서대로 돌려준다.
+
+import os
+from functools import partial
+
+from worker_pool import default_threads_per_worker, limit_threads, spawn_pool
+
+
+def init_worker(num_threads: int):
+    """
+    워커 프로세스 시작 시 1번 실행.
+    스레드 예산을 정하고 감정 모델을 미리 로드해 둔다 (파일마다 다시 로드 X).
+    """
+    import emotion_infer
+
+    model = emotion_infer.get_emotion_model()
+    limit_threads(num_threads, torch_threads=model.backend == "torch")
+    model.load()
+    print(f"[worker {os.getpid()}] ready (threads={num_threads})")
+
+
+def map_files(func, paths, workers: int = 1, threads_per_worker: int = None):
+    """
+    paths의 각 파일에 func(path)를 실행하고 결과를 입력 순서대로 yield.
+
+    workers <= 1 이면 현재 프로세스에서 순서대로 처리하고,
+    그 이상이면 spawn 프로세스 풀에서 처리한다. func는 모듈 최상위 함수여야 한다.
+    """
+    paths = list(paths)
+
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield func(path)
+        return
+
+    workers = min(workers, len(paths))
+    threads = threads_per_worker or default_threads_per_worker(workers)
+    print(f"  [parallel] workers={workers}, threads/worker={threads}")
+
+    with spawn_pool(workers, init_worker, (threads,)) as pool:
+        # imap은 완료 순서가 아니라 입력 순서대로 결과를 준다 → 출력 순서가 결정적
+        for result in pool.imap(func, paths, chunksize=1):
+            yield result
+
+
+def _collect_batches(batches_func, path):
+    """워커에서 실행: 파일 하나의 배치들을 하나의 row 리스트로 합쳐서 돌려줌"""
+    rows = []
+    for batch in batches_func(path):
+        rows.extend(batch)
+    return rows
+
+
+def iter_file_batches(batches_func, paths, workers: int = 1, threads_per_worker: int = None):
+    """
+    (path, 그 파일의 row 배치 iterator)를 입력 파일 순서대로 yield.
+
+    batches_func(path)는 결과 row 리스트를 배치 단위로 yield 하는 모듈 최상위 함수.
+    단일 프로세스면 배치가 끝나는 대로 바로 흘려보내고,
+    멀티 프로세스면 워커가 끝낸 파일 단위로 한 번에 돌려준다.
+    """
+    paths = list(paths)
+
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, batches_func(path)
+        return
+
+    results = map_files(partial(_collect_batches, batches_func), paths, workers, threads_per_worker)
+    for path, rows in zip(paths, results):
+        yield path, [rows]
@@ -0,0 +1,49 @@
+# build_audio_catalog.py
+#
+# 원천데이터 음성 파일 카탈로그(audio_catalog)를 만들거나 갱신한다.
+# 처음 한 번은 전체를 훑고, 이후에는 mtime이 바뀐 폴더만 다시 읽는다.
+#
+#   python build_audio_catalog.py --root ".../2.Validation/원천데이터_220125_add" --probe
+#   python build_audio_catalog.py --summary
+
+import argparse
+
+from audio_catalog import DEFAULT_CATALOG_PATH, PROBE_WORKERS, AudioCatalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI-Hub 음성 파일 카탈로그 갱신")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH)
+    parser.add_argument("--root", action="append", default=[],
+                        help="원천데이터 폴더 (여러 번 지정 가능, 없으면 등록된 폴더 전체)")
+    parser.add_argument("--full", action="store_true", help="mtime과 상관없이 모든 폴더를 다시 읽기")
+    parser.add_argument("--probe", action="store_true", help="duration이 비어 있는 파일을 ffprobe로 채우기")
+    parser.add_argument("--probe-limit", type=int, default=None)
+    parser.add_argument("--probe-workers", type=int, default=PROBE_WORKERS)
+    parser.add_argument("--summary", action="store_true", help="domain / category별 파일 수 출력")
+    args = parser.parse_args()
+
+    catalog = AudioCatalog(args.catalog)
+
+    for root in args.root or catalog.roots():
+        stats = catalog.refresh(root, full=args.full)
+        print(f"[REFRESH] {root}")
+        for k, v in stats.items():
+            print(f" - {k}: {v:.2f}" if isinstance(v, float) else f" - {k}: {v}")
+
+    if args.probe:
+        filled = catalog.fill_durations(limit=args.probe_limit, workers=args.probe_workers)
+        print(f"[PROBE] duration {filled}개 채움")
+
+    if args.summary:
+        print("\n=== domain / category ===")
+        for row in catalog.summary():
+            hours = (row["duration_sec"] or 0.0) / 3600
+            print(
+                f" - {row['domain']}/{row['category']}: {row['files']}개,"
+                f" {hours:.1f}h (미측정 {row['unprobed']}개)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# check_packed_inference.py
+#
+# packed 추론(짧은 문장 여러 개를 128 토큰 한 줄에 이어 붙임)이
+# 기존 padded 추론과 같은 확률을 내는지 확인하고, 속도와 패딩 낭비를 비교한다.
+#
+#   python check_packed_inference.py
+#   python check_packed_inference.py --texts heldout.txt --report packed.json
+
+import sys
+import json
+import argparse
+
+from emotion_infer import MAX_LENGTH, MODEL_DIR, PACKED_ATOL, EmotionModel, pack_sequences
+from quantize_emotion_model import BATCH_SIZE, MAX_TEXTS, VAL_LABEL_DIR, load_heldout_texts, timed_probs
+
+
+def token_slots(lengths, batch_size):
+    """padded 방식(길이순 정렬 후 batch_size씩)과 packed 방식이 쓰는 토큰 칸 수"""
+    ordered = sorted(lengths)
+    padded = 0
+    for start in range(0, len(ordered), batch_size):
+        bucket = ordered[start:start + batch_size]
+        padded += max(bucket) * len(bucket)
+
+    packed = 0
+    rows = pack_sequences(lengths, MAX_LENGTH)
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        packed += max(sum(lengths[i] for i in row) for row in chunk) * len(chunk)
+    return padded, packed, len(rows)
+
+
+def parity_report(unpacked, packed, texts, batch_size=BATCH_SIZE, atol=PACKED_ATOL) -> dict:
+    unpacked.warmup(batch_size=min(batch_size, 8))
+    packed.warmup(batch_size=min(batch_size, 8))
+
+    ref_probs, ref_sec = timed_probs(unpacked, texts, batch_size)
+    # packed에서 batch_size는 문장 수가 아니라 row 수 (row 하나의 길이 상한은 MAX_LENGTH로 같음)
+    packed_probs, packed_sec = timed_probs(packed, texts, batch_size)
+
+    agree = 0
+    max_diff = 0.0
+    for p, q in zip(ref_probs, packed_probs):
+        if max(range(len(p)), key=p.__getitem__) == max(range(len(q)), key=q.__getitem__):
+            agree += 1
+        max_diff = max(max_diff, max(abs(a - b) for a, b in zip(p, q)))
+
+    lengths = unpacked.tokenizer.batch_encode_fast(texts, max_length=MAX_LENGTH)["attention_mask"].sum(axis=1).tolist()
+    padded_slots, packed_slots, num_rows = token_slots(lengths, batch_size)
+    real_tokens = sum(lengths)
+
+    n = len(texts)
+    return {
+        "num_texts": n,
+        "num_packed_rows": num_rows,
+        "texts_per_row": n / num_rows if num_rows else 0.0,
+        "label_agreement": agree / n if n else 0.0,
+        "max_prob_diff": max_diff,
+        "atol": atol,
+        "within_atol": max_diff <= atol,
+        "padded_token_efficiency": real_tokens / padded_slots if padded_slots else 0.0,
+        "packed_token_efficiency": real_tokens / packed_slots if packed_slots else 0.0,
+        "unpacked_seconds": ref_sec,
+        "packed_seconds": packed_sec,
+        "speedup": ref_sec / packed_sec if packed_sec else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="packed vs padded 감정 추론 parity / 속도 비교")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--texts", help="문장 파일 (한 줄에 한 문장)")
+    parser.add_argument("--label-dir", default=VAL_LABEL_DIR, help="--texts가 없을 때 쓸 라벨링 JSON 폴더")
+    parser.add_argument("--limit", type=int, default=MAX_TEXTS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--atol", type=float, default=PACKED_ATOL)
+    parser.add_argument("--report", help="리포트를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    # packed는 fp32 전용이라 비교 기준(unpacked)도 fp32로 맞춘다
+    unpacked = EmotionModel(args.model_dir, cache_size=0, quantize=None, packed=False).load()
+    packed = EmotionModel(args.model_dir, cache_size=0, quantize=None, packed=True).load()
+
+    texts = load_heldout_texts(args.texts, args.label_dir, args.limit)
+    if not texts:
+        print("❗ 비교에 쓸 문장이 없습니다.")
+        sys.exit(1)
+    print(f"[INFO] 문장 {len(texts)}개로 비교")
+
+    report = parity_report(unpacked, packed, texts, batch_size=args.batch_size, atol=args.atol)
+
+    print("\n=== padded vs packed ===")
+    for k, v in report.items():
+        print(f" - {k}: {v:.4f}" if isinstance(v, float) else f" - {k}: {v}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n[DONE] 리포트 저장 → {args.report}")
+
+    if not report["within_atol"]:
+        print(f"❗ 확률 차이가 허용 오차({report['atol']})를 넘습니다.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# eval_stt_cascade.py
+#
+# Whisper cascade(작은 모델 → 자신 없는 segment만 큰 모델)를
+# 항상 큰 모델로 돌린 결과(기준)와 비교해서 CER / escalate 비율 / 시간을 리포트한다.
+#
+#   python eval_stt_cascade.py --audio-dir ".../원천데이터_220125_add/쇼핑" --limit 50
+#   python eval_stt_cascade.py --cascade tiny,small --report cascade.json
+
+import os
+import glob
+import json
+import time
+import argparse
+
+from stt_infer import (
+    DEFAULT_LANGUAGE,
+    character_error_rate,
+    get_whisper_model,
+    resolve_device,
+    resolve_dtype,
+    transcribe_audio,
+    transcribe_cascade,
+    load_audio,
+)
+
+AUDIO_DIR = "/Users/ijiho/Downloads/022.민원(콜센터) 질의-응답 데이터/01.데이터/2.Validation/원천데이터_220125_add/쇼핑"
+MAX_FILES = 50
+
+
+def list_audio_files(audio_dir, limit):
+    paths = sorted(glob.glob(os.path.join(audio_dir, "**", "*.m4a"), recursive=True))
+    return paths[:limit]
+
+
+def evaluate(paths, cheap_size, large_size, device=None, language=DEFAULT_LANGUAGE) -> dict:
+    device = resolve_device(device)
+    dtype = resolve_dtype(device)
+    cheap = get_whisper_model(cheap_size, device, dtype)
+    large = get_whisper_model(large_size, device, dtype)
+
+    per_file = []
+    baseline_sec = 0.0
+    cascade_sec = 0.0
+    for path in paths:
+        # 디코딩 시간이 비교에 섞이지 않게 파형을 먼저 읽어 둔다
+        audio = load_audio(path)
+
+        start = time.perf_counter()
+        baseline = transcribe_audio(large, audio, dtype, language, vad=False)
+        b_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = transcribe_cascade(cheap, large, audio, dtype, language, False, cheap_size, large_size)
+        c_sec = time.perf_counter() - start
+
+        baseline_sec += b_sec
+        cascade_sec += c_sec
+        stats = result["cascade"]
+        cer = character_error_rate(baseline["text"], result["text"])
+        per_file.append({
+            "path": path,
+            "cer_vs_baseline": cer,
+            "segments": stats["segments"],
+            "escalated": stats["escalated"],
+            "compute_saved": stats["compute_saved"],
+            "baseline_seconds": b_sec,
+            "cascade_seconds": c_sec,
+        })
+        print(
+            f"[{len(per_file)}/{len(paths)}] {os.path.basename(path)}  CER={cer:.3f}"
+            f"  escalated={stats['escalated']}/{stats['segments']}  {b_sec:.1f}s → {c_sec:.1f}s"
+        )
+
+    n = len(per_file)
+    segments = sum(f["segments"] for f in per_file)
+    escalated = sum(f["escalated"] for f in per_file)
+    saved = [f["compute_saved"] for f in per_file if f["compute_saved"] is not None]
+    return {
+        "models": [cheap_size, large_size],
+        "num_files": n,
+        "mean_cer_vs_baseline": sum(f["cer_vs_baseline"] for f in per_file) / n if n else 0.0,
+        "segments": segments,
+        "escalated": escalated,
+        "escalation_rate": escalated / segments if segments else 0.0,
+        "mean_compute_saved": sum(saved) / len(saved) if saved else None,
+        "baseline_seconds": baseline_sec,
+        "cascade_seconds": cascade_sec,
+        "speedup": baseline_sec / cascade_sec if cascade_sec else 0.0,
+        "files": per_file,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper cascade vs 큰 모델 단독 품질 / 속도 비교")
+    parser.add_argument("--audio-dir", default=AUDIO_DIR)
+    parser.add_argument("--limit", type=int, default=MAX_FILES)
+    parser.add_argument("--cascade", default="base,small", help="작은 모델,큰 모델 (예: tiny,small)")
+    parser.add_argument("--device", default=None, help="기본: 자동 선택")
+    parser.add_argument("--report", help="리포트를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    cheap_size, large_size = [m.strip() for m in args.cascade.split(",")]
+
+    paths = list_audio_files(args.audio_dir, args.limit)
+    if not paths:
+        print("❗ m4a 파일이 없습니다.")
+        return
+    print(f"[INFO] {len(paths)}개 파일로 비교 ({cheap_size} → {large_size} vs {large_size})")
+
+    report = evaluate(paths, cheap_size, large_size, args.device)
+
+    print("\n=== cascade vs baseline ===")
+    for k, v in report.items():
+        if k == "files":
+            continue
+        print(f" - {k}: {v:.4f}" if isinstance(v, float) else f" - {k}: {v}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n[DONE] 리포트 저장 → {args.report}")
+
+
+if __name__ == "__main__":
+    main()
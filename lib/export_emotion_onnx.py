@@ -0,0 +1,26 @@
+# export_emotion_onnx.py
+#
+# kobert_emotion_final 모델을 ONNX로 내보내고 PyTorch logits와 오차를 검증한다.
+# 내보낸 뒤에는 EMOTION_BACKEND=onnx 로 emotion_infer가 onnxruntime을 사용한다.
+#
+#   python export_emotion_onnx.py
+#   python export_emotion_onnx.py --atol 1e-3
+
+import argparse
+
+from emotion_infer import MODEL_DIR, ONNX_EXPORT_ATOL, export_onnx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="감정 모델 ONNX export + logits 검증")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--output", help="저장할 .onnx 경로 (기본: model-dir/model.onnx)")
+    parser.add_argument("--atol", type=float, default=ONNX_EXPORT_ATOL, help="허용 logits 오차")
+    args = parser.parse_args()
+
+    path = export_onnx(args.model_dir, args.output, atol=args.atol)
+    print(f"[DONE] {path}")
+
+
+if __name__ == "__main__":
+    main()
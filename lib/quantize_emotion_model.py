@@ -0,0 +1,154 @@
+# quantize_emotion_model.py
+#
+# fp32 감정 모델을 동적 int8 양자화해서 (선택) 저장하고,
+# held-out 문장들로 fp32 vs int8 결과가 얼마나 같은지 parity 리포트를 출력한다.
+#
+#   python quantize_emotion_model.py --save
+#   python quantize_emotion_model.py --texts heldout.txt --report parity.json
+
+import os
+import io
+import glob
+import json
+import time
+import argparse
+
+from aihub_io import iter_json_array
+from emotion_infer import (
+    MODEL_DIR,
+    EmotionModel,
+    quantize_model,
+    save_quantized_model,
+)
+
+VAL_LABEL_DIR = "/Users/ijiho/Downloads/022.민원(콜센터) 질의-응답 데이터/01.데이터/2.Validation/라벨링데이터_231222_add"
+
+MAX_TEXTS = 2000
+BATCH_SIZE = 64
+
+
+def load_heldout_texts(texts_path=None, label_dir=VAL_LABEL_DIR, limit=MAX_TEXTS):
+    """
+    parity 비교용 문장 리스트.
+    texts_path가 있으면 한 줄에 한 문장인 텍스트 파일에서,
+    없으면 Validation 라벨링 JSON의 고객 발화에서 limit개까지 가져온다.
+    """
+    texts = []
+
+    if texts_path:
+        with open(texts_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    texts.append(line)
+                if len(texts) >= limit:
+                    break
+        return texts
+
+    for json_path in sorted(glob.glob(os.path.join(label_dir, "*.json"))):
+        for row in iter_json_array(json_path):
+            if (row.get("화자") or "").strip() != "고객":
+                continue
+            for k in ("고객질문(요청)", "고객답변"):
+                v = (row.get(k) or "").strip()
+                if v:
+                    texts.append(v)
+                    break
+            if len(texts) >= limit:
+                return texts
+
+    return texts
+
+
+def state_dict_bytes(model) -> int:
+    """state_dict를 직렬화했을 때 크기 (가중치 메모리 크기 근사치)"""
+    import torch
+
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell()
+
+
+def timed_probs(emotion_model, texts, batch_size):
+    start = time.perf_counter()
+    probs = emotion_model.predict_probs(texts, batch_size=batch_size)
+    return probs, time.perf_counter() - start
+
+
+def parity_report(fp32, int8, texts, batch_size=BATCH_SIZE) -> dict:
+    """fp32 / int8 두 EmotionModel의 라벨 일치율, 확률 차이, 속도, 가중치 크기 비교"""
+    # 첫 호출의 초기화 비용이 속도 비교에 섞이지 않게 워밍업
+    fp32.warmup(batch_size=min(batch_size, 8))
+    int8.warmup(batch_size=min(batch_size, 8))
+
+    fp32_probs, fp32_sec = timed_probs(fp32, texts, batch_size)
+    int8_probs, int8_sec = timed_probs(int8, texts, batch_size)
+
+    agree = 0
+    max_drift = 0.0
+    sum_drift = 0.0
+    for p, q in zip(fp32_probs, int8_probs):
+        if max(range(len(p)), key=p.__getitem__) == max(range(len(q)), key=q.__getitem__):
+            agree += 1
+        drift = max(abs(a - b) for a, b in zip(p, q))
+        max_drift = max(max_drift, drift)
+        sum_drift += drift
+
+    n = len(texts)
+    fp32_bytes = state_dict_bytes(fp32.model)
+    int8_bytes = state_dict_bytes(int8.model)
+
+    return {
+        "num_texts": n,
+        "label_agreement": agree / n if n else 0.0,
+        "mean_max_prob_drift": sum_drift / n if n else 0.0,
+        "max_prob_drift": max_drift,
+        "fp32_seconds": fp32_sec,
+        "int8_seconds": int8_sec,
+        "speedup": fp32_sec / int8_sec if int8_sec else 0.0,
+        "fp32_weight_bytes": fp32_bytes,
+        "int8_weight_bytes": int8_bytes,
+        "size_ratio": fp32_bytes / int8_bytes if int8_bytes else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="감정 모델 동적 int8 양자화 + fp32 parity 리포트")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--save", action="store_true", help="양자화 가중치를 model-dir에 저장")
+    parser.add_argument("--texts", help="held-out 문장 파일 (한 줄에 한 문장)")
+    parser.add_argument("--label-dir", default=VAL_LABEL_DIR, help="--texts가 없을 때 쓸 라벨링 JSON 폴더")
+    parser.add_argument("--limit", type=int, default=MAX_TEXTS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--report", help="parity 리포트를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    fp32 = EmotionModel(args.model_dir, cache_size=0, quantize=None).load()
+
+    if args.save:
+        # quantize_dynamic은 복사본을 만들기 때문에 fp32 모델은 그대로 남는다
+        path = save_quantized_model(quantize_model(fp32.model), args.model_dir)
+        print(f"[SAVE] int8 가중치 저장 → {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    int8 = EmotionModel(args.model_dir, cache_size=0, quantize="int8").load()
+
+    texts = load_heldout_texts(args.texts, args.label_dir, args.limit)
+    if not texts:
+        print("❗ parity 비교에 쓸 문장이 없습니다.")
+        return
+    print(f"[INFO] held-out 문장 {len(texts)}개로 비교")
+
+    report = parity_report(fp32, int8, texts, batch_size=args.batch_size)
+
+    print("\n=== fp32 vs int8 parity ===")
+    for k, v in report.items():
+        print(f" - {k}: {v:.4f}" if isinstance(v, float) else f" - {k}: {v}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n[DONE] 리포트 저장 → {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,18 @@
 
 import os
 import glob
-import csv
-import json
-from emotion_infer import tokenizer, model, id2label
-import torch
+import argparse
+from functools import partial
+from emotion_infer import emotion_labels, get_emotion_model, predict_emotions
+from aihub_io import COLUMNAR_FORMATS, SINK_FORMATS, iter_json_array, mark_done_after_flush, open_sink, write_file_batches
+from aihub_parallel import iter_file_batches
+from aihub_pipeline import (
+    DEFAULT_QUEUE_DEPTH,
+    DEFAULT_TOKENIZER_WORKERS,
+    FileDone,
+    print_stage_report,
+    run_pipeline,
+)
 
 TRAIN_LABEL_DIR = "/Users/ijiho/Downloads/022.민원(콜센터) 질의-응답 데이터/01.데이터/1.Training/라벨링데이터_231222_add"
 
@@ -37,142 +45,221 @@ def extract_text(row):
 # ───────────────────────────────────────────────
 # Batch 예측
 # ───────────────────────────────────────────────
-def batch_predict(text_list):
-    inputs = tokenizer(
-        text_list,
-        return_tensors="pt",
-        padding=True,
-        truncation=True,
-        max_length=128,
-    )
+def batch_predict(text_list, with_probs=False):
+    # 길이 버킷팅 + inference_mode는 emotion_infer.predict_emotions가 처리
+    # with_probs면 (라벨, 점수, {라벨: 확률}) 형태
+    return predict_emotions(text_list, batch_size=BATCH_SIZE, return_probs=with_probs)
+
+
+FIELDNAMES = [
+    "file", "call_id", "domain", "category",
+    "customer_turn_index", "raw_turn_index", "speaker", "text",
+    "emotion", "score",
+]
+
+
+def make_rows(batch_info, preds):
+    rows = []
+    for info, (emo, score, *probs) in zip(batch_info, preds):
+        row = {
+            "split": info[8],
+            "file": info[0],
+            "call_id": info[1],
+            "domain": info[2],
+            "category": info[3],
+            "customer_turn_index": info[4],
+            "raw_turn_index": info[5],
+            "speaker": info[6],
+            "text": info[7],
+            "emotion": emo,
+            "score": score,
+        }
+        if probs:
+            row.update({f"prob_{label}": p for label, p in probs[0].items()})
+        rows.append(row)
+    return rows
+
+
+# ───────────────────────────────────────────────
+# json 파일 1개 읽기 → 모델에 넣을 (batch_info, batch_texts) 배치를 yield
+# ───────────────────────────────────────────────
+def iter_file_requests(split_name, json_path):
+    fname = os.path.basename(json_path)
+    print(f"  - Processing file: {fname}")
+
+    batch_texts = []
+    batch_info = []
+
+    conv_counter = {}
+
+    # JSON을 전체 로드하지 않고 row 하나씩 스트리밍 처리
+    for row in iter_json_array(json_path):
+        speaker = (row.get("화자") or "").strip()
+        if speaker != "고객":
+            continue
+
+        text = extract_text(row)
+        if not text:
+            continue
+
+        conv_id = row.get("대화셋일련번호")
+        if not conv_id:
+            continue
+
+        # 고객 발화 번호 증가
+        conv_counter.setdefault(conv_id, 0)
+        conv_counter[conv_id] += 1
+        turn_index = conv_counter[conv_id]
+
+        # 문장번호
+        try:
+            raw_turn = int(row.get("문장번호", 0))
+        except:
+            raw_turn = 0
+
+        domain = row.get("도메인", "")
+        category = row.get("카테고리", "")
+
+        # 배치 리스트에 저장
+        batch_texts.append(text)
+        batch_info.append((fname, conv_id, domain, category, turn_index, raw_turn, speaker, text, split_name))
 
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probs = torch.softmax(outputs.logits, dim=1)
-        score, idx = torch.max(probs, dim=1)
+        # ───── 배치 단위로 모델에 넣기 ─────
+        if len(batch_texts) >= BATCH_SIZE:
+            yield batch_info, batch_texts
+            batch_texts = []
+            batch_info = []
 
-    results = []
-    for i, s in zip(idx, score):
-        results.append((id2label[int(i.item())], float(s)))
-    return results
+    # ───── 남은 배치 처리 ─────
+    if batch_texts:
+        yield batch_info, batch_texts
+
+    print(f"    → Completed {fname}")
+
+
+# ───────────────────────────────────────────────
+# json 파일 1개 처리 → 배치가 끝날 때마다 결과 row 리스트를 yield
+# (워커 프로세스에서도 이 함수 단위로 실행)
+# ───────────────────────────────────────────────
+def process_file(split_name, json_path, with_probs=False):
+    for batch_info, batch_texts in iter_file_requests(split_name, json_path):
+        yield make_rows(batch_info, batch_predict(batch_texts, with_probs))
 
 
 # ───────────────────────────────────────────────
 # split 처리
 # ───────────────────────────────────────────────
-def process_split(split_name, folder):
+def list_split_files(split_name, folder, skip=None):
+    """split 폴더의 json 파일 목록 (skip(path)가 True인 파일은 제외)"""
     print(f"\n[INFO] Processing {split_name} ...")
 
     json_list = sorted(glob.glob(os.path.join(folder, "*.json")))
     print(f"  Found {len(json_list)} json files\n")
 
-    results = []
-    for json_path in json_list:
-        fname = os.path.basename(json_path)
-        print(f"  - Processing file: {fname}")
-
-        # JSON을 전체 로드하지 않고 스트리밍 처리
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        batch_texts = []
-        batch_info = []
-
-        conv_counter = {}
-
-        for row in data:
-            speaker = (row.get("화자") or "").strip()
-            if speaker != "고객":
-                continue
-
-            text = extract_text(row)
-            if not text:
-                continue
-
-            conv_id = row.get("대화셋일련번호")
-            if not conv_id:
-                continue
-
-            # 고객 발화 번호 증가
-            conv_counter.setdefault(conv_id, 0)
-            conv_counter[conv_id] += 1
-            turn_index = conv_counter[conv_id]
-
-            # 문장번호
-            try:
-                raw_turn = int(row.get("문장번호", 0))
-            except:
-                raw_turn = 0
-
-            domain = row.get("도메인", "")
-            category = row.get("카테고리", "")
-
-            # 배치 리스트에 저장
-            batch_texts.append(text)
-            batch_info.append((fname, conv_id, domain, category, turn_index, raw_turn, speaker, text))
-
-            # ───── 배치 단위로 모델에 넣기 ─────
-            if len(batch_texts) >= BATCH_SIZE:
-                preds = batch_predict(batch_texts)
-                for info, (emo, score) in zip(batch_info, preds):
-                    results.append({
-                        "file": info[0],
-                        "call_id": info[1],
-                        "domain": info[2],
-                        "category": info[3],
-                        "customer_turn_index": info[4],
-                        "raw_turn_index": info[5],
-                        "speaker": info[6],
-                        "text": info[7],
-                        "emotion": emo,
-                        "score": score,
-                    })
-                batch_texts = []
-                batch_info = []
-
-        # ───── 남은 배치 처리 ─────
-        if batch_texts:
-            preds = batch_predict(batch_texts)
-            for info, (emo, score) in zip(batch_info, preds):
-                results.append({
-                    "file": info[0],
-                    "call_id": info[1],
-                    "domain": info[2],
-                    "category": info[3],
-                    "customer_turn_index": info[4],
-                    "raw_turn_index": info[5],
-                    "speaker": info[6],
-                    "text": info[7],
-                    "emotion": emo,
-                    "score": score,
-                })
-
-        print(f"    → Completed {fname}")
-
-    return results
+    if skip is not None:
+        json_list = [p for p in json_list if not skip(p)]
+    return json_list
 
 
-# ───────────────────────────────────────────────
-# main
-# ───────────────────────────────────────────────
-def main():
-    rows = []
+def process_split(split_name, folder, workers=1, threads_per_worker=None, skip=None, with_probs=False):
+    """
+    (json 경로, 결과 배치 iterator)를 입력 파일 순서대로 yield.
+    workers > 1 이면 멀티 프로세스, skip(path)가 True인 파일은 건너뜀.
+    """
+    json_list = list_split_files(split_name, folder, skip)
+
+    yield from iter_file_batches(
+        partial(process_file, split_name, with_probs=with_probs), json_list, workers, threads_per_worker
+    )
 
-    for split, folder in SPLITS:
-        rows.extend(process_split(split, folder))
 
-    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
+# ───────────────────────────────────────────────
+# 파이프라인 모드: 읽기 / 토크나이즈 / 모델 / 쓰기를 단계별 스레드로 겹쳐서 실행
+# ───────────────────────────────────────────────
+def run_pipelined(sink, manifest, skip=None, with_probs=False,
+                  tokenizer_workers=DEFAULT_TOKENIZER_WORKERS, queue_depth=DEFAULT_QUEUE_DEPTH):
+    emotion_model = get_emotion_model().load()
+    rows_in_file = [0]
+    total = [0]
+
+    def source():
+        for split, folder in SPLITS:
+            for json_path in list_split_files(split, folder, skip):
+                yield from iter_file_requests(split, json_path)
+                yield FileDone(json_path)
+
+    def write(batch_info, preds):
+        rows = make_rows(batch_info, preds)
+        sink.write_rows(rows)
+        rows_in_file[0] += len(rows)
+
+    def file_done(json_path):
+        mark_done_after_flush(sink, manifest, json_path, rows_in_file[0])
+        total[0] += rows_in_file[0]
+        rows_in_file[0] = 0
+
+    reports = run_pipeline(
+        source(),
+        tokenize_fn=emotion_model.encode_batch,
+        model_fn=partial(emotion_model.predict_encoded, return_probs=with_probs),
+        write_fn=write,
+        on_file_done=file_done,
+        tokenizer_workers=tokenizer_workers,
+        queue_depth=queue_depth,
+    )
+    print_stage_report(reports)
+    return total[0]
 
-    with open(OUTPUT_CSV, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=[
-            "file", "call_id", "domain", "category",
-            "customer_turn_index", "raw_turn_index", "speaker", "text",
-            "emotion", "score",
-        ])
-        writer.writeheader()
-        writer.writerows(rows)
 
-    print(f"\n[DONE] Saved {len(rows)} rows → {OUTPUT_CSV}")
+# ───────────────────────────────────────────────
+# main
+# ───────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="AI-Hub 라벨링 데이터 고객 발화 감정 분석 (row 단위)")
+    parser.add_argument("--workers", type=int, default=1, help="병렬 워커 프로세스 수")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="워커당 torch 스레드 수 (기본: 코어 수 / 워커 수)")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--format", choices=SINK_FORMATS, default="csv",
+                        help="parquet / arrow 면 --output은 폴더 (split/domain별로 나눠 저장)")
+    parser.add_argument("--with-probs", action="store_true", help="클래스별 확률(prob_*) 컬럼도 저장")
+    parser.add_argument("--resume", action="store_true",
+                        help="manifest에 완료로 기록된 파일은 건너뛰고 결과를 이어쓰기")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="읽기/토크나이즈/모델/쓰기를 단계별 스레드로 겹쳐서 실행 (단일 프로세스)")
+    parser.add_argument("--tokenizer-workers", type=int, default=DEFAULT_TOKENIZER_WORKERS)
+    parser.add_argument("--queue-depth", type=int, default=DEFAULT_QUEUE_DEPTH,
+                        help="파이프라인 단계 사이 큐에 쌓아 둘 최대 배치 수")
+    args = parser.parse_args()
+
+    if args.pipeline and args.workers > 1:
+        parser.error("--pipeline은 --workers 1 일 때만 사용할 수 있습니다")
+
+    fieldnames = FIELDNAMES
+    if args.format in COLUMNAR_FORMATS:
+        # parquet / arrow는 split=/domain= 폴더로 나눠 저장하므로 split 컬럼이 필요 (CSV / JSONL 헤더는 그대로)
+        fieldnames = ["split"] + fieldnames
+    if args.with_probs:
+        fieldnames = fieldnames + [f"prob_{label}" for label in emotion_labels()]
+
+    sink, manifest = open_sink(args.output, fieldnames, args.format, args.resume)
+    skip = manifest.is_done if args.resume else None
+
+    # 배치가 끝날 때마다 바로 기록하고, 파일이 끝날 때마다 manifest에 체크포인트
+    with sink:
+        if args.pipeline:
+            num_rows = run_pipelined(
+                sink, manifest, skip, args.with_probs, args.tokenizer_workers, args.queue_depth
+            )
+        else:
+            num_rows = 0
+            for split, folder in SPLITS:
+                file_batches = process_split(
+                    split, folder, args.workers, args.threads_per_worker, skip, args.with_probs
+                )
+                num_rows += write_file_batches(file_batches, sink, manifest)
+
+    print(f"\n[DONE] Saved {num_rows} rows → {args.output}")
 
 
 if __name__ == "__main__":
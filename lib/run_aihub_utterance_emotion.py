@@ -2,11 +2,13 @@
 
 import os
 import glob
-import json
-import csv
+import argparse
 from collections import defaultdict
+from functools import partial
 
-from emotion_infer import predict_emotions_by_utterance
+from emotion_infer import collect_customer_turns, emotion_labels, predict_emotions
+from aihub_io import SINK_FORMATS, iter_json_array, open_sink, write_file_batches
+from aihub_parallel import iter_file_batches
 
 
 # 🔹 네 환경에 맞게 경로만 확인/수정
@@ -21,6 +23,25 @@ SPLITS = [
 
 OUTPUT_CSV = "/Users/ijiho/Desktop/callcenter_customer_emotions_all.csv"
 
+BATCH_SIZE = 64             # 한 번의 forward에 넣는 발화 수
+FLUSH_SIZE = BATCH_SIZE * 8  # 여러 통화에서 이만큼 모이면 길이 버킷팅해서 한꺼번에 예측
+
+NO_META = {"domain": "", "category1": ""}
+
+FIELDNAMES = [
+    "split",
+    "file",
+    "call_id",
+    "domain",
+    "category1",
+    "customer_turn_index",
+    "raw_turn_index",
+    "speaker",
+    "text",
+    "emotion",
+    "score",
+]
+
 
 def get_text_for_row(row: dict) -> str:
     """
@@ -41,10 +62,118 @@ def get_text_for_row(row: dict) -> str:
     return ""
 
 
-def process_split(split_name: str, label_dir: str):
+def process_file(split_name: str, json_path: str, with_probs: bool = False):
+    """
+    json 파일 1개를 처리해서 예측 배치가 끝날 때마다 결과 row 리스트를 yield.
+    (워커 프로세스에서도 이 함수 단위로 실행)
+    """
+    file_name = os.path.basename(json_path)
+    print(f"  - {file_name}")
+
+    # 통화별로 발화 모으기
+    # (원본 row 전체가 아니라 필요한 필드만 남기고, 파일은 row 하나씩 스트리밍으로 읽음)
+    dialogs = defaultdict(list)
+
+    for row in iter_json_array(json_path):  # 최상단이 리스트라고 가정
+        conv_id = row.get("대화식별번호")
+        if not conv_id:
+            continue
+
+        speaker = (row.get("화자") or "").strip()
+        text = get_text_for_row(row)
+        # 문장번호가 문자열일 수 있으니 int 변환
+        try:
+            turn = int(row.get("문장번호", 0))
+        except ValueError:
+            turn = 0
+
+        # 도메인/카테고리도 같이 기록해두면 나중에 분석에 유리
+        domain = row.get("도메인", "")
+        category1 = row.get("카테고리1", "")
+
+        dialogs[conv_id].append({
+            "speaker": speaker,
+            "text": text,
+            "turn": turn,
+            "domain": domain,
+            "category1": category1,
+        })
+
+    # 각 통화별로 정렬 후 고객 발화만 골라 두고, 여러 통화의 발화를 모아서 큰 배치로 감정 분석
+    pending = []   # (통화 ID, 고객 발화 정보, 그 턴의 메타) — 아직 예측 안 한 것들
+
+    for conv_id, utterances in dialogs.items():
+        # turn 순으로 정렬
+        utterances.sort(key=lambda x: x["turn"])
+
+        # turn → domain/category1 인덱스 (같은 turn이 여러 개면 첫 번째 것 사용)
+        meta_by_turn = {}
+        for u in utterances:
+            meta_by_turn.setdefault(u["turn"], u)
+
+        # 고객 발화만 감정 분석 대상 (상담사는 자동으로 스킵), 통화별 customer_turn_index 부여
+        turns = collect_customer_turns(
+            utterances,
+            speaker_key="speaker",
+            text_key="text",
+            customer_tag="고객",   # 화자 값이 '고객'인 경우만 사용
+        )
+        for t in turns:
+            pending.append((conv_id, t, meta_by_turn.get(t["raw_turn_index"], NO_META)))
+
+        if len(pending) >= FLUSH_SIZE:
+            yield predict_rows(split_name, file_name, pending, with_probs)
+            pending = []
+
+    if pending:
+        yield predict_rows(split_name, file_name, pending, with_probs)
+
+
+def predict_rows(split_name: str, file_name: str, pending, with_probs: bool = False):
+    """
+    여러 통화에서 모은 고객 발화들을 한 번에 예측해서 출력 row 리스트로 만든다.
+    with_probs면 클래스별 확률(prob_*) 컬럼도 붙인다.
+    """
+    preds = predict_emotions(
+        [t["text"] for _, t, _ in pending],
+        batch_size=BATCH_SIZE,
+        return_probs=with_probs,
+    )
+
+    rows = []
+    for (conv_id, r, meta), (emotion, score, *probs) in zip(pending, preds):
+        row = {
+            "split": split_name,                       # train / val
+            "file": file_name,                         # 어떤 json에서 왔는지
+            "call_id": conv_id,                        # 대화식별번호
+            "domain": meta.get("domain", ""),
+            "category1": meta.get("category1", ""),
+            "customer_turn_index": r["customer_turn_index"],  # 1번째/2번째 고객 발화
+            "raw_turn_index": r["raw_turn_index"],            # 전체 발화 순서
+            "speaker": r["speaker"],                   # 항상 '고객'
+            "text": r["text"],
+            "emotion": emotion,                        # anger / sad / fear
+            "score": score,                            # 확률
+        }
+        if probs:
+            row.update({f"prob_{label}": p for label, p in probs[0].items()})
+        rows.append(row)
+    return rows
+
+
+def process_split(
+    split_name: str,
+    label_dir: str,
+    workers: int = 1,
+    threads_per_worker: int = None,
+    skip=None,
+    with_probs: bool = False,
+):
     """
     한 split(train 또는 val)의 폴더 안에 있는
-    모든 .json 파일을 처리해서 결과 row 리스트를 리턴.
+    모든 .json 파일에 대해 (json 경로, 결과 배치 iterator)를 입력 파일 순서대로 yield.
+    workers > 1 이면 파일들을 여러 워커 프로세스에 나눠서 처리하고,
+    skip(path)가 True인 파일(이미 끝난 파일)은 건너뛴다.
     """
     print(f"\n[INFO] Processing split={split_name}, dir={label_dir}")
 
@@ -52,110 +181,44 @@ def process_split(split_name: str, label_dir: str):
     json_paths = sorted(glob.glob(os.path.join(label_dir, "*.json")))
     print(f"  Found {len(json_paths)} json files")
 
-    all_rows = []
-
-    for json_path in json_paths:
-        file_name = os.path.basename(json_path)
-        print(f"  - {file_name}")
-
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)  # 최상단이 리스트라고 가정
-
-        # 통화별로 발화 모으기
-        dialogs = defaultdict(list)
-
-        for row in data:
-            conv_id = row.get("대화식별번호")
-            if not conv_id:
-                continue
-
-            speaker = (row.get("화자") or "").strip()
-            text = get_text_for_row(row)
-            # 문장번호가 문자열일 수 있으니 int 변환
-            try:
-                turn = int(row.get("문장번호", 0))
-            except ValueError:
-                turn = 0
-
-            # 도메인/카테고리도 같이 기록해두면 나중에 분석에 유리
-            domain = row.get("도메인", "")
-            category1 = row.get("카테고리1", "")
-
-            dialogs[conv_id].append({
-                "speaker": speaker,
-                "text": text,
-                "turn": turn,
-                "domain": domain,
-                "category1": category1,
-            })
-
-        # 각 통화별로 정렬 후 감정 분석
-        for conv_id, utterances in dialogs.items():
-            # turn 순으로 정렬
-            utterances.sort(key=lambda x: x["turn"])
-
-            # 고객 발화만 감정 분석 (상담사는 자동으로 스킵)
-            results = predict_emotions_by_utterance(
-                utterances,
-                speaker_key="speaker",
-                text_key="text",
-                customer_tag="고객",   # 화자 값이 '고객'인 경우만 사용
-            )
+    if skip is not None:
+        json_paths = [p for p in json_paths if not skip(p)]
 
-            # 결과 정리
-            for r in results:
-                # 해당 turn의 domain/category1 찾아오기
-                # (utterances 리스트에서 raw_turn_index에 해당하는 것)
-                meta = next(
-                    (u for u in utterances if u["turn"] == r["raw_turn_index"]),
-                    {"domain": "", "category1": ""}
-                )
-
-                all_rows.append({
-                    "split": split_name,                       # train / val
-                    "file": file_name,                         # 어떤 json에서 왔는지
-                    "call_id": conv_id,                        # 대화식별번호
-                    "domain": meta.get("domain", ""),
-                    "category1": meta.get("category1", ""),
-                    "customer_turn_index": r["customer_turn_index"],  # 1번째/2번째 고객 발화
-                    "raw_turn_index": r["raw_turn_index"],            # 전체 발화 순서
-                    "speaker": r["speaker"],                   # 항상 '고객'
-                    "text": r["text"],
-                    "emotion": r["emotion"],                   # anger / sad / fear
-                    "score": r["score"],                       # 확률
-                })
-
-    return all_rows
+    yield from iter_file_batches(
+        partial(process_file, split_name, with_probs=with_probs), json_paths, workers, threads_per_worker
+    )
 
 
 def main():
-    rows = []
-    for split_name, label_dir in SPLITS:
-        rows.extend(process_split(split_name, label_dir))
-
-    # CSV 저장
-    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
-    with open(OUTPUT_CSV, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=[
-                "split",
-                "file",
-                "call_id",
-                "domain",
-                "category1",
-                "customer_turn_index",
-                "raw_turn_index",
-                "speaker",
-                "text",
-                "emotion",
-                "score",
-            ],
-        )
-        writer.writeheader()
-        writer.writerows(rows)
+    parser = argparse.ArgumentParser(description="AI-Hub 라벨링 데이터 통화별 고객 발화 감정 분석")
+    parser.add_argument("--workers", type=int, default=1, help="병렬 워커 프로세스 수")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="워커당 torch 스레드 수 (기본: 코어 수 / 워커 수)")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--format", choices=SINK_FORMATS, default="csv",
+                        help="parquet / arrow 면 --output은 폴더 (split/domain별로 나눠 저장)")
+    parser.add_argument("--with-probs", action="store_true", help="클래스별 확률(prob_*) 컬럼도 저장")
+    parser.add_argument("--resume", action="store_true",
+                        help="manifest에 완료로 기록된 파일은 건너뛰고 결과를 이어쓰기")
+    args = parser.parse_args()
+
+    # 결과는 통화가 끝날 때마다 바로 기록하고, 파일이 끝날 때마다 manifest에 체크포인트
+    fieldnames = FIELDNAMES
+    if args.with_probs:
+        fieldnames = FIELDNAMES + [f"prob_{label}" for label in emotion_labels()]
+
+    sink, manifest = open_sink(args.output, fieldnames, args.format, args.resume)
+    skip = manifest.is_done if args.resume else None
+
+    num_rows = 0
+    with sink:
+        for split_name, label_dir in SPLITS:
+            file_batches = process_split(
+                split_name, label_dir, args.workers, args.threads_per_worker, skip, args.with_probs
+            )
+            num_rows += write_file_batches(file_batches, sink, manifest)
 
-    print(f"\n[DONE] Saved {len(rows)} rows to {OUTPUT_CSV}")
+    print(f"\n[DONE] Saved {num_rows} rows to {args.output}")
 
 
 if __name__ == "__main__":
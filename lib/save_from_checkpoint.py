@@ -27,15 +27,14 @@ tokenizer = AutoTokenizer.from_pretrained("monologg/kobert", trust_remote_code=T
 
 # ---- KoBERT tokenizer manual save ----
 # vocab.txt
-vocab_path = tokenizer.vocab_file
-shutil.copy(vocab_path, os.path.join(MODEL_SAVE_DIR, "vocab.txt"))
-
-# sentencepiece 모델 파일 있으면 같이 복사
-if hasattr(tokenizer, "sp_model_file"):
-    shutil.copy(
-        tokenizer.sp_model_file,
-        os.path.join(MODEL_SAVE_DIR, "tokenizer.model")
-    )
+shutil.copy(tokenizer.vocab_txt, os.path.join(MODEL_SAVE_DIR, "vocab.txt"))
+
+# sentencepiece 모델 파일 (KoBertTokenizer에서는 vocab_file이 .model 파일)
+# → emotion_infer.load_tokenizer가 허브 없이 로컬에서 토크나이저를 만들 때 필요
+shutil.copy(
+    tokenizer.vocab_file,
+    os.path.join(MODEL_SAVE_DIR, os.path.basename(tokenizer.vocab_file))
+)
 
 # tokenizer_config.json
 with open(os.path.join(MODEL_SAVE_DIR, "tokenizer_config.json"), "w", encoding="utf-8") as f:
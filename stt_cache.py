@@ -0,0 +1,419 @@
+# stt_cache.py
+#
+# Whisper 인식 결과를 디스크(sqlite)에 저장해 두는 캐시.
+# 키는 음성 파일 "내용"의 해시 + 모델 크기 + 언어 + 디코딩 옵션이라서
+# 파일을 옮기거나 이름을 바꿔도 다시 인식하지 않고, 옵션이 바뀌면 새로 인식한다.
+#
+# sqlite WAL 모드 + busy timeout으로 여러 프로세스가 같은 파일을 동시에 써도 안전하고,
+# 전체 크기가 max_bytes를 넘으면 가장 오래 안 쓴 항목부터 지운다.
+#
+# DecodedAudioCache는 ffmpeg 디코딩 결과(16kHz mono float32)를 파일 해시별 .npy로 저장해 두고
+# memory-map으로 읽어서, 같은 파일을 다시 처리할 때 ffmpeg를 띄우지 않게 한다.
+# (16kHz float32는 1시간에 약 230MB라서 max_bytes를 넘으면 오래 안 쓴 .npy부터 지운다)
+#
+# 두 캐시는 파일 내용 해시 메모(FileHashMemo)를 같이 써서 파일 하나를 한 번만 읽어 해시한다.
+import os
+import json
+import zlib
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "STT_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "callcenter_stt", "transcripts.sqlite3"),
+)
+DEFAULT_MAX_BYTES = int(float(os.environ.get("STT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+DEFAULT_AUDIO_CACHE_DIR = os.environ.get(
+    "STT_AUDIO_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "callcenter_stt", "audio"),
+)
+DEFAULT_HASH_MEMO_PATH = os.environ.get(
+    "STT_HASH_MEMO_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "callcenter_stt", "file_hashes.sqlite3"),
+)
+DEFAULT_AUDIO_MAX_BYTES = int(float(os.environ.get("STT_AUDIO_CACHE_MAX_MB", "4096")) * 1024 * 1024)
+
+# 캐시에 남기는 segment 필드 (tokens 같은 큰 필드는 버림)
+SEGMENT_FIELDS = (
+    "start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio", "temperature", "escalated",
+)
+
+_HASH_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    key         TEXT PRIMARY KEY,
+    audio_hash  TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    language    TEXT,
+    options     TEXT NOT NULL,
+    payload     BLOB NOT NULL,
+    size        INTEGER NOT NULL,
+    created     REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_last_access ON transcripts (last_access);
+"""
+
+_HASH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    audio_hash  TEXT NOT NULL
+);
+"""
+
+
+def hash_file(path: str) -> str:
+    """파일 내용의 sha256 (1MB씩 읽음)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _open(local, path):
+    """스레드 / 프로세스마다 별도 connection (fork 후에는 새로 연다)"""
+    conn = getattr(local, "conn", None)
+    if conn is None or local.pid != os.getpid():
+        conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        local.conn = conn
+        local.pid = os.getpid()
+    return _Transaction(conn)
+
+
+class FileHashMemo:
+    """
+    파일 내용 해시(sha256) 메모. (경로, 크기, mtime)이 같으면 저장해 둔 해시를 재사용해서
+    큰 파일을 매번 다시 읽지 않는다. TranscriptCache와 DecodedAudioCache가 같이 쓴다.
+    """
+
+    def __init__(self, path: str = DEFAULT_HASH_MEMO_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_HASH_SCHEMA)
+
+    def _connect(self):
+        return _open(self._local, self.path)
+
+    def hash(self, path: str) -> str:
+        st = os.stat(path)
+        path = os.path.abspath(path)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT audio_hash FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, st.st_size, st.st_mtime_ns),
+            ).fetchone()
+        if row:
+            return row[0]
+
+        audio_hash = hash_file(path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, audio_hash) VALUES (?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, audio_hash),
+            )
+        return audio_hash
+
+
+def make_key(audio_hash: str, model: str, language: str, options: dict) -> str:
+    """음성 해시 + 모델 + 언어 + 옵션 → 캐시 키"""
+    raw = json.dumps(
+        {"audio": audio_hash, "model": model, "language": language, "options": options},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def compact_result(result: dict) -> dict:
+    """whisper 결과에서 캐시에 필요한 부분만 남긴다"""
+    segments = []
+    for seg in result.get("segments") or []:
+        item = {k: seg[k] for k in SEGMENT_FIELDS if k in seg}
+        if seg.get("words"):
+            item["words"] = seg["words"]
+        segments.append(item)
+
+    compact = {"text": result.get("text", ""), "segments": segments, "language": result.get("language")}
+    for k in ("vad", "cascade"):
+        if k in result:
+            compact[k] = result[k]
+    return compact
+
+
+class TranscriptCache:
+    """
+    디스크 STT 결과 캐시.
+
+        cache = TranscriptCache()
+        key = cache.key_for(audio_path, "small", "ko", {"fp16": False})
+        result = cache.get(key)
+        if result is None:
+            result = model.transcribe(audio_path, ...)
+            cache.put(key, result)
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, hash_memo: FileHashMemo = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hash_memo = hash_memo
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return _open(self._local, self.path)
+
+    def audio_hash(self, path: str) -> str:
+        """파일 내용 해시 (공유 FileHashMemo 사용)"""
+        return (self.hash_memo or get_hash_memo()).hash(path)
+
+    def key_for(self, audio_path: str, model: str, language: str, options: dict) -> str:
+        return make_key(self.audio_hash(audio_path), model, language, options)
+
+    def get(self, key: str):
+        """캐시된 결과 dict (없으면 None)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (time.time(), key))
+
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, key: str, result: dict, audio_hash: str = "", model: str = "", language: str = None, options: dict = None):
+        """결과를 저장하고, 전체 크기가 max_bytes를 넘으면 오래 안 쓴 것부터 지운다"""
+        payload = zlib.compress(json.dumps(compact_result(result), ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts"
+                " (key, audio_hash, model, language, options, payload, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, audio_hash, model, language, json.dumps(options or {}, sort_keys=True, default=str),
+                 payload, len(payload), now, now),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM transcripts ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM transcripts")
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts").fetchone()
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class _Transaction:
+    """
+    with 블록을 트랜잭션 하나로 묶는다 (autocommit connection 기준).
+    BEGIN을 직접 건 경우에만 끝에서 COMMIT / ROLLBACK.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class DecodedAudioCache:
+    """
+    디코딩된 파형 캐시. root/<hash 앞 2글자>/<hash>.npy 에 float32 배열로 저장.
+
+        audio = DecodedAudioCache().load(audio_path)   # np.memmap (16kHz mono float32)
+        model.transcribe(audio, ...)
+
+    파일 해시는 결과 캐시와 같은 FileHashMemo를 쓴다 (같은 파일을 두 번 해시하지 않고,
+    결과 캐시(STT_CACHE)를 꺼도 그쪽 sqlite를 만들지 않음). hash_fn을 주면 그것을 쓴다.
+    .npy 전체 크기가 max_bytes를 넘으면 mtime(마지막으로 쓴 시각)이 오래된 것부터 지운다.
+    """
+
+    def __init__(self, root: str = DEFAULT_AUDIO_CACHE_DIR, max_bytes: int = DEFAULT_AUDIO_MAX_BYTES, hash_fn=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hash_fn = hash_fn
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total = None      # .npy 전체 바이트 (처음 쓸 때 한 번 훑어서 계산)
+        self._lock = threading.Lock()
+
+    def audio_hash(self, path: str) -> str:
+        return get_hash_memo().hash(path)
+
+    def path_for(self, audio_hash: str) -> str:
+        return os.path.join(self.root, audio_hash[:2], audio_hash + ".npy")
+
+    def load(self, audio_path: str, decode_fn=None):
+        """
+        캐시된 파형을 memory-map으로 연다. 없으면 decode_fn(audio_path)로 디코딩해서 저장.
+        decode_fn 기본값은 whisper.load_audio (ffmpeg).
+        """
+        import numpy as np
+
+        hash_fn = self.hash_fn or self.audio_hash
+        npy_path = self.path_for(hash_fn(audio_path))
+
+        if os.path.isfile(npy_path):
+            self.hits += 1
+            try:
+                # 읽을 때 mtime을 갱신해서 LRU 순서로 쓴다 (atime은 noatime 마운트면 안 바뀜)
+                os.utime(npy_path)
+            except OSError:
+                pass
+            # "c"(copy-on-write): torch.from_numpy가 읽기 전용 경고를 내지 않고, 디스크에는 안 씀
+            return np.load(npy_path, mmap_mode="c")
+
+        self.misses += 1
+        if decode_fn is None:
+            import whisper
+            decode_fn = whisper.load_audio
+        audio = np.ascontiguousarray(decode_fn(audio_path), dtype=np.float32)
+
+        # 다른 프로세스가 같은 파일을 동시에 만들어도 깨지지 않게 임시 파일에 쓰고 rename
+        os.makedirs(os.path.dirname(npy_path), exist_ok=True)
+        tmp_path = f"{npy_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp_path, npy_path)
+        self._added(os.path.getsize(npy_path))
+        return audio
+
+    def _entries(self):
+        """(mtime, 크기, 경로) 리스트"""
+        entries = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".npy"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(e[1] for e in self._entries())
+            else:
+                self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # 다른 프로세스도 같은 폴더에 쓰므로 지울 때는 실제 파일 목록으로 다시 계산
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._total = total
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "root": self.root,
+            "files": len(entries),
+            "bytes": sum(e[1] for e in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        import shutil
+
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self._lock:
+            self._total = None
+
+
+_default_cache = None
+_default_audio_cache = None
+_default_hash_memo = None
+_default_cache_lock = threading.Lock()
+
+
+def get_hash_memo() -> FileHashMemo:
+    """프로세스에서 공유하는 파일 해시 메모 (STT_HASH_MEMO_PATH)"""
+    global _default_hash_memo
+    if _default_hash_memo is None:
+        with _default_cache_lock:
+            if _default_hash_memo is None:
+                _default_hash_memo = FileHashMemo()
+    return _default_hash_memo
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """프로세스에서 공유하는 기본 캐시 (STT_CACHE_PATH / STT_CACHE_MAX_MB)"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = TranscriptCache()
+    return _default_cache
+
+
+def get_audio_cache() -> DecodedAudioCache:
+    """프로세스에서 공유하는 기본 디코딩 캐시 (STT_AUDIO_CACHE_DIR / STT_AUDIO_CACHE_MAX_MB)"""
+    global _default_audio_cache
+    if _default_audio_cache is None:
+        with _default_cache_lock:
+            if _default_audio_cache is None:
+                _default_audio_cache = DecodedAudioCache()
+    return _default_audio_cache
@@ -0,0 +1,598 @@
+# stt_infer.py
+#
+# Whisper STT 모델을 프로세스 전체에서 공유하는 레지스트리.
+# (모델 크기, device, dtype) 별로 한 번만 로드하고, STTAgent / stt_pipeline /
+# CallcenterAudioProcessor가 전부 같은 모델 객체를 쓴다.
+import os
+import subprocess
+import threading
+import time
+
+# 기본 Whisper 모델 크기. 환경변수 STT_MODEL_SIZE로 변경 가능
+DEFAULT_MODEL_SIZE = os.environ.get("STT_MODEL_SIZE", "small").strip()
+
+# device: 비워 두면 cuda → mps → cpu 순서로 자동 선택. 환경변수 STT_DEVICE로 고정 가능
+DEFAULT_DEVICE = os.environ.get("STT_DEVICE", "").strip().lower() or None
+
+# dtype: "fp32" / "fp16". 비워 두면 cuda는 fp16, 나머지는 fp32
+DEFAULT_DTYPE = os.environ.get("STT_DTYPE", "").strip().lower() or None
+DTYPES = ("fp32", "fp16")
+
+DEFAULT_LANGUAGE = "ko"
+
+# 파일 경로로 인식할 때 디스크 결과 캐시(stt_cache)를 쓸지. 환경변수 STT_CACHE=0 으로 끔
+DEFAULT_CACHE = os.environ.get("STT_CACHE", "1").strip().lower() not in ("0", "false", "no")
+
+# 디코딩한 파형을 .npy로 저장해 두고 재사용할지 (stt_cache.DecodedAudioCache). STT_AUDIO_CACHE=0 으로 끔
+# (크기 상한은 STT_AUDIO_CACHE_MAX_MB, 넘으면 오래 안 쓴 파일부터 지움)
+DEFAULT_AUDIO_CACHE = os.environ.get("STT_AUDIO_CACHE", "1").strip().lower() not in ("0", "false", "no")
+
+# whisper가 쓰는 샘플링 레이트 (load_audio 결과 기준)
+SAMPLE_RATE = 16000
+
+# Whisper에 넣기 전에 무음 구간을 잘라낼지 (audio_vad). 환경변수 STT_VAD=1 로 켬
+DEFAULT_VAD = os.environ.get("STT_VAD", "0").strip().lower() in ("1", "true", "yes")
+
+# transcribe_many: 여러 파일의 30초 창을 한 번에 디코딩할 배치 크기
+BULK_BATCH_SIZE = 16
+
+# cascade 모드: 앞 모델로 먼저 인식하고, 자신 없는 segment만 뒤 모델로 다시 인식.
+# 환경변수 STT_CASCADE="base,small" 처럼 지정 (비우면 끔)
+DEFAULT_CASCADE = tuple(m.strip() for m in os.environ.get("STT_CASCADE", "").split(",") if m.strip()) or None
+
+# segment를 큰 모델로 다시 돌리는 기준
+CASCADE_LOGPROB_THRESHOLD = -0.7        # avg_logprob가 이보다 낮으면
+CASCADE_NO_SPEECH_THRESHOLD = 0.5       # 텍스트가 있는데 no_speech_prob가 이보다 높으면
+CASCADE_COMPRESSION_THRESHOLD = 2.0     # 같은 말 반복(환각) 의심
+CASCADE_PAD_SEC = 0.2
+
+# 연산량 비교용 모델 파라미터 수 (백만). compute saved 추정에 사용
+MODEL_PARAMS_M = {
+    "tiny": 39, "base": 74, "small": 244, "medium": 769,
+    "large": 1550, "large-v2": 1550, "large-v3": 1550, "turbo": 809,
+}
+
+# whisper.transcribe와 같은 무음 판정 기준 (no_speech 확률이 높고 logprob가 낮으면 버림)
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+def select_device() -> str:
+    """사용 가능한 가속기를 골라서 device 문자열 반환 (cuda → mps → cpu)"""
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def resolve_device(device: str = None) -> str:
+    device = device or DEFAULT_DEVICE
+    if device in (None, "auto"):
+        return select_device()
+    return device
+
+
+def resolve_dtype(device: str, dtype: str = None) -> str:
+    dtype = dtype or DEFAULT_DTYPE
+    if dtype is None:
+        # fp16은 GPU에서만 빠르고, CPU에서는 whisper가 어차피 fp32로 돌린다
+        dtype = "fp16" if device.startswith("cuda") else "fp32"
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype은 {DTYPES} 중 하나여야 함: {dtype!r}")
+    return dtype
+
+
+_models = {}
+_load_seconds = {}
+_registry_lock = threading.Lock()
+_key_locks = {}
+
+
+def _load_whisper(model_size: str, device: str, dtype: str):
+    import whisper
+
+    print(f"[stt_infer] Whisper '{model_size}' 로딩 중... (device={device}, dtype={dtype})")
+    model = whisper.load_model(model_size, device=device)
+    if dtype == "fp16":
+        model = model.half()
+    return model
+
+
+def get_whisper_model(model_size: str = None, device: str = None, dtype: str = None):
+    """
+    (model_size, device, dtype)에 해당하는 Whisper 모델을 반환.
+    처음 요청될 때 한 번만 로드하고, 이후에는 같은 객체를 돌려준다.
+    """
+    model_size = model_size or DEFAULT_MODEL_SIZE
+    device = resolve_device(device)
+    dtype = resolve_dtype(device, dtype)
+    key = (model_size, device, dtype)
+
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    # 서로 다른 키는 동시에 로드할 수 있게 키별 lock 사용
+    with _registry_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        model = _models.get(key)
+        if model is None:
+            start = time.perf_counter()
+            try:
+                model = _load_whisper(model_size, device, dtype)
+            except (RuntimeError, NotImplementedError) as e:
+                if device != "mps":
+                    raise
+                # 일부 whisper / torch 버전은 mps에서 로드가 안 됨 → cpu 모델을 이 키에도 등록
+                print(f"[stt_infer] mps 로딩 실패 ({e}) → cpu로 로드")
+                model = get_whisper_model(model_size, "cpu", "fp32")
+            else:
+                _load_seconds[key] = time.perf_counter() - start
+                print(f"[stt_infer] 로딩 완료 ({_load_seconds[key]:.1f}s)")
+            _models[key] = model
+    return model
+
+
+def loaded_models() -> dict:
+    """현재 로드된 모델 키 → 로딩에 걸린 시간(초)"""
+    return dict(_load_seconds)
+
+
+def clear_models():
+    """레지스트리에서 모델을 모두 내린다 (테스트 / 메모리 정리용)"""
+    with _registry_lock:
+        _models.clear()
+        _load_seconds.clear()
+        _key_locks.clear()
+
+
+def probe_duration(audio_path: str):
+    """ffprobe로 음성 길이(초)를 읽는다. ffprobe가 없거나 실패하면 None"""
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", audio_path],
+            capture_output=True,
+            text=True,
+            timeout=30,
+            check=True,
+        ).stdout.strip()
+        return float(out)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def probe_durations(audio_paths, workers: int = 8):
+    """여러 파일의 probe_duration 리스트 (입력 순서, 실패한 파일은 None)"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    audio_paths = list(audio_paths)
+    if not audio_paths:
+        return []
+    # ffprobe는 프로세스를 띄우는 I/O 대기라서 스레드로 동시에 돌린다
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(probe_duration, audio_paths))
+
+
+def transcribe_options(dtype: str, language: str = DEFAULT_LANGUAGE, **options) -> dict:
+    """model.transcribe()에 넘길 기본 옵션 (dtype에 맞춰 fp16 플래그 설정)"""
+    opts = {"language": language, "fp16": dtype == "fp16"}
+    opts.update(options)
+    return opts
+
+
+def load_audio(audio_path: str, use_cache: bool = DEFAULT_AUDIO_CACHE):
+    """
+    음성 파일 → 16kHz mono float32 파형 (whisper와 같은 ffmpeg 디코딩).
+    use_cache=True면 한 번 디코딩한 파일은 .npy memory-map으로 바로 읽는다 (ffmpeg 안 띄움).
+    """
+    if use_cache:
+        from stt_cache import get_audio_cache
+
+        return get_audio_cache().load(audio_path)
+
+    import whisper
+
+    return whisper.load_audio(audio_path)
+
+
+def transcribe_audio(model, audio, dtype: str, language: str = DEFAULT_LANGUAGE, vad: bool = DEFAULT_VAD, **options) -> dict:
+    """
+    이미 로드된 Whisper 모델로 음성 1개를 인식.
+
+    vad=True면 audio_vad로 말소리 구간만 이어 붙여서 인식하고,
+    segments 타임스탬프를 원본 기준으로 되돌린 뒤 result["vad"]에 건너뛴 비율 등을 넣는다.
+    """
+    opts = transcribe_options(dtype, language, **options)
+
+    # 경로를 그대로 넘기면 whisper가 매번 ffmpeg로 디코딩하므로 (캐시된) 파형으로 바꿔서 넘긴다
+    if isinstance(audio, str):
+        audio = load_audio(audio)
+
+    if not vad:
+        return model.transcribe(audio, **opts)
+
+    from audio_vad import compact_speech, detect_speech, remap_segments, vad_stats
+
+    regions = detect_speech(audio)
+    speech, offsets = compact_speech(audio, regions)
+    stats = vad_stats(regions, len(audio) / SAMPLE_RATE)
+
+    if len(speech) == 0:
+        result = {"text": "", "segments": [], "language": language}
+    else:
+        result = model.transcribe(speech, **opts)
+        remap_segments(result["segments"], offsets)
+
+    result["vad"] = stats
+    return result
+
+
+def escalation_reason(seg: dict):
+    """segment를 큰 모델로 다시 인식해야 하면 이유 문자열, 아니면 None"""
+    if not seg.get("text", "").strip():
+        return None
+    if seg.get("avg_logprob", 0.0) < CASCADE_LOGPROB_THRESHOLD:
+        return "avg_logprob"
+    if seg.get("no_speech_prob", 0.0) > CASCADE_NO_SPEECH_THRESHOLD:
+        return "no_speech_prob"
+    if seg.get("compression_ratio", 0.0) > CASCADE_COMPRESSION_THRESHOLD:
+        return "compression_ratio"
+    return None
+
+
+def cascade_settings(escalate_size: str = None) -> dict:
+    """cascade 결과에 영향을 주는 설정 (캐시 키용)"""
+    return {
+        "escalate_model": escalate_size,
+        "logprob_threshold": CASCADE_LOGPROB_THRESHOLD,
+        "no_speech_threshold": CASCADE_NO_SPEECH_THRESHOLD,
+        "compression_threshold": CASCADE_COMPRESSION_THRESHOLD,
+        "pad_sec": CASCADE_PAD_SEC,
+    }
+
+
+def transcribe_cascade(
+    cheap_model,
+    large_model,
+    audio,
+    dtype: str,
+    language: str = DEFAULT_LANGUAGE,
+    vad: bool = DEFAULT_VAD,
+    cheap_size: str = None,
+    large_size: str = None,
+    **options,
+) -> dict:
+    """
+    cheap_model로 전체를 인식하고, escalation_reason에 걸린 segment만 large_model로 다시 인식.
+    연속으로 걸린 segment들은 구간 하나로 묶어서 한 번에 다시 돌린다 (앞뒤 문맥 유지).
+
+    result["cascade"]: segment 수 / escalate 된 수 / 큰 모델이 본 음성 길이 /
+    파라미터 수 기준으로 추정한 compute_saved (항상 큰 모델만 쓸 때 대비).
+    """
+    if isinstance(audio, str):
+        audio = load_audio(audio)
+    total_sec = len(audio) / SAMPLE_RATE
+
+    start = time.perf_counter()
+    result = transcribe_audio(cheap_model, audio, dtype, language, vad, **options)
+    cheap_sec = time.perf_counter() - start
+
+    segments = result["segments"]
+    reasons = [escalation_reason(seg) for seg in segments]
+
+    # 연속된 escalate 대상 segment를 [i, j) 구간으로 묶는다
+    runs = []
+    i = 0
+    while i < len(segments):
+        if reasons[i] is None:
+            i += 1
+            continue
+        j = i
+        while j < len(segments) and reasons[j] is not None:
+            j += 1
+        runs.append((i, j))
+        i = j
+
+    new_segments = []
+    escalated_sec = 0.0
+    large_sec = 0.0
+    prev = 0
+    for i, j in runs:
+        new_segments.extend(segments[prev:i])
+        span_start = max(0.0, segments[i]["start"] - CASCADE_PAD_SEC)
+        span_end = min(total_sec, segments[j - 1]["end"] + CASCADE_PAD_SEC)
+        clip = audio[int(span_start * SAMPLE_RATE):int(span_end * SAMPLE_RATE)]
+
+        start = time.perf_counter()
+        retry = transcribe_audio(large_model, clip, dtype, language, False, **options)
+        large_sec += time.perf_counter() - start
+        escalated_sec += span_end - span_start
+
+        for seg in retry["segments"]:
+            seg["start"] += span_start
+            seg["end"] += span_start
+            seg["escalated"] = reasons[i]
+            new_segments.append(seg)
+        prev = j
+    new_segments.extend(segments[prev:])
+
+    if runs:
+        result["segments"] = new_segments
+        result["text"] = "".join(seg["text"] for seg in new_segments)
+
+    num_escalated = sum(1 for r in reasons if r is not None)
+    cheap_params = MODEL_PARAMS_M.get(cheap_size)
+    large_params = MODEL_PARAMS_M.get(large_size)
+    compute_saved = None
+    if cheap_params and large_params and total_sec > 0:
+        cost = cheap_params * total_sec + large_params * escalated_sec
+        compute_saved = 1.0 - cost / (large_params * total_sec)
+
+    result["cascade"] = {
+        "models": [cheap_size, large_size],
+        "segments": len(segments),
+        "escalated": num_escalated,
+        "escalation_rate": num_escalated / len(segments) if segments else 0.0,
+        "reasons": {r: reasons.count(r) for r in set(reasons) if r is not None},
+        "audio_sec": total_sec,
+        "escalated_audio_sec": escalated_sec,
+        "cheap_seconds": cheap_sec,
+        "large_seconds": large_sec,
+        "compute_saved": compute_saved,
+    }
+    return result
+
+
+def character_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    공백을 뺀 글자 단위 편집 거리 / 기준 글자 수 (한국어 STT 품질 비교용 CER).
+    cascade 결과를 항상 큰 모델로 돌린 결과(기준)와 비교할 때 쓴다.
+    """
+    ref = "".join(reference.split())
+    hyp = "".join(hypothesis.split())
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def get_cache():
+    """공유 디스크 결과 캐시 (stt_cache.get_transcript_cache)"""
+    from stt_cache import get_transcript_cache
+
+    return get_transcript_cache()
+
+
+def transcribe_file(
+    model,
+    audio,
+    model_size: str,
+    dtype: str,
+    language: str = DEFAULT_LANGUAGE,
+    vad: bool = DEFAULT_VAD,
+    cache=None,
+    escalate_model=None,
+    escalate_size: str = None,
+    **options,
+) -> dict:
+    """
+    transcribe_audio + 디스크 결과 캐시.
+    audio가 파일 경로이고 cache(stt_cache.TranscriptCache)가 있으면
+    (파일 내용 해시, 모델, 언어, 옵션)이 같은 이전 결과를 그대로 돌려준다.
+    escalate_model이 있으면 model → escalate_model cascade(transcribe_cascade)로 인식한다.
+    """
+    def run():
+        if escalate_model is None:
+            return transcribe_audio(model, audio, dtype, language, vad, **options)
+        return transcribe_cascade(
+            model, escalate_model, audio, dtype, language, vad, model_size, escalate_size, **options
+        )
+
+    if cache is None or not isinstance(audio, str):
+        return run()
+
+    from stt_cache import make_key
+
+    key_options = dict(transcribe_options(dtype, language, **options), vad=vad)
+    key_options.pop("language")
+    key_model = model_size if escalate_model is None else f"{model_size}>{escalate_size}"
+    if escalate_model is not None:
+        # escalate 기준이 바뀌면 결과도 달라지므로 키에 포함
+        key_options["cascade"] = cascade_settings(escalate_size)
+    audio_hash = cache.audio_hash(audio)
+    key = make_key(audio_hash, key_model, language, key_options)
+
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    result = run()
+    cache.put(key, result, audio_hash, key_model, language, key_options)
+    return result
+
+
+def transcribe(
+    audio,
+    model_size: str = None,
+    device: str = None,
+    dtype: str = None,
+    language: str = DEFAULT_LANGUAGE,
+    vad: bool = DEFAULT_VAD,
+    use_cache: bool = DEFAULT_CACHE,
+    **options,
+) -> dict:
+    """
+    공유 Whisper 모델로 음성 1개를 인식해서 whisper 결과 dict(text / segments ...)를 반환.
+    audio는 파일 경로 또는 16kHz float32 파형. vad=True면 무음 구간을 건너뛴다.
+    use_cache=True면 파일 경로 입력은 디스크 캐시(stt_cache)를 먼저 확인한다.
+    """
+    model_size = model_size or DEFAULT_MODEL_SIZE
+    device = resolve_device(device)
+    dtype = resolve_dtype(device, dtype)
+    model = get_whisper_model(model_size, device, dtype)
+    cache = get_cache() if use_cache else None
+    return transcribe_file(model, audio, model_size, dtype, language, vad, cache, **options)
+
+
+def _error_result(language: str, e: Exception) -> dict:
+    return {"text": "", "segments": [], "language": language, "error": f"{type(e).__name__}: {e}"}
+
+
+def transcribe_many(
+    audio_paths,
+    model_size: str = None,
+    device: str = None,
+    dtype: str = None,
+    language: str = DEFAULT_LANGUAGE,
+    batch_size: int = BULK_BATCH_SIZE,
+    use_cache: bool = DEFAULT_CACHE,
+):
+    """
+    대량 인식용. 파일마다 30초 log-mel 창으로 자르고, 여러 파일의 창을 batch_size개씩 묶어
+    encoder + greedy 디코딩(whisper.decode)을 한 번에 돌린 뒤 파일별로 다시 이어 붙인다.
+
+    (path, result)를 입력 순서대로 yield. result는 text / segments(창 1개 = segment 1개) / language,
+    디코딩에 실패한 파일은 result["error"]에 메시지가 들어간다.
+    파일 1개 지연 시간보다 처리량이 중요할 때 쓰고, temperature fallback / 창 경계 보정은 하지 않는다.
+    """
+    import torch
+    import whisper
+    from whisper.audio import N_SAMPLES
+
+    audio_paths = list(audio_paths)
+    model_size = model_size or DEFAULT_MODEL_SIZE
+    device = resolve_device(device)
+    dtype = resolve_dtype(device, dtype)
+    model = get_whisper_model(model_size, device, dtype)
+    cache = get_cache() if use_cache else None
+
+    fp16 = dtype == "fp16"
+    n_mels = getattr(model.dims, "n_mels", 80)
+    decode_options = whisper.DecodingOptions(
+        task="transcribe",
+        language=language,
+        temperature=0.0,
+        without_timestamps=True,
+        fp16=fp16,
+    )
+    # transcribe()와 알고리즘이 달라서 캐시 키도 따로 잡는다
+    key_options = {"fp16": fp16, "mode": "batched", "temperature": 0.0}
+
+    results = {}    # 입력 순서 → 완료된 result
+    pending = {}    # 입력 순서 → 창이 아직 남은 파일 상태
+    batch = []      # (입력 순서, 창 번호, 시작 초, 길이 초, mel)
+    next_out = 0
+
+    def finish(idx):
+        state = pending.pop(idx)
+        segments = [seg for seg in state["segments"] if seg["text"]]
+        result = {
+            "text": " ".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "language": language,
+        }
+        if cache is not None:
+            cache.put(state["key"], result, state["audio_hash"], model_size, language, key_options)
+        results[idx] = result
+
+    def flush():
+        if not batch:
+            return
+        try:
+            mels = torch.stack([item[4] for item in batch]).to(model.device)
+            decoded = whisper.decode(model, mels, decode_options)
+        except Exception as e:
+            # 배치가 실패하면 그 배치에 창이 들어 있던 파일들만 실패로 처리
+            for idx in {item[0] for item in batch}:
+                if pending.pop(idx, None) is not None:
+                    print(f"[stt_infer] 디코딩 실패: {audio_paths[idx]} ({e})")
+                    results[idx] = _error_result(language, e)
+            batch.clear()
+            return
+
+        for (idx, window_no, offset, duration, _), r in zip(batch, decoded):
+            state = pending.get(idx)
+            if state is None:
+                continue
+            text = r.text.strip()
+            if r.no_speech_prob > NO_SPEECH_THRESHOLD and r.avg_logprob < LOGPROB_THRESHOLD:
+                text = ""
+            state["segments"][window_no] = {
+                "start": offset,
+                "end": offset + duration,
+                "text": text,
+                "avg_logprob": r.avg_logprob,
+                "no_speech_prob": r.no_speech_prob,
+                "compression_ratio": r.compression_ratio,
+                "temperature": r.temperature,
+            }
+            state["remaining"] -= 1
+            if state["remaining"] == 0:
+                finish(idx)
+        batch.clear()
+
+    def add_file(idx, path):
+        """캐시에 있으면 바로 results에, 없으면 창들을 배치에 넣는다"""
+        key = audio_hash = None
+        if cache is not None:
+            from stt_cache import make_key
+
+            audio_hash = cache.audio_hash(path)
+            key = make_key(audio_hash, model_size, language, key_options)
+            hit = cache.get(key)
+            if hit is not None:
+                results[idx] = hit
+                return
+
+        # 파일 하나의 창을 다 만든 뒤에 배치에 넣는다 (중간에 실패해도 배치가 오염되지 않게)
+        audio = load_audio(path)
+        windows = []
+        for window_no, start in enumerate(range(0, len(audio), N_SAMPLES)):
+            chunk = audio[start:start + N_SAMPLES]
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), n_mels)
+            windows.append((idx, window_no, start / SAMPLE_RATE, len(chunk) / SAMPLE_RATE, mel))
+
+        pending[idx] = {
+            "segments": [None] * len(windows),
+            "remaining": len(windows),
+            "key": key,
+            "audio_hash": audio_hash,
+        }
+        if not windows:
+            finish(idx)
+            return
+
+        for window in windows:
+            batch.append(window)
+            if len(batch) >= batch_size:
+                flush()
+
+    for idx, path in enumerate(audio_paths):
+        try:
+            add_file(idx, path)
+        except Exception as e:
+            print(f"[stt_infer] 인식 실패: {path} ({e})")
+            pending.pop(idx, None)
+            results[idx] = _error_result(language, e)
+
+        # 앞쪽 파일이 다 끝났으면 순서대로 내보낸다 (finally 밖에서 yield)
+        while next_out in results:
+            yield audio_paths[next_out], results.pop(next_out)
+            next_out += 1
+
+    flush()
+    while next_out in results:
+        yield audio_paths[next_out], results.pop(next_out)
+        next_out += 1
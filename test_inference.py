@@ -1,6 +1,8 @@
 import os
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoModelForSequenceClassification
+
+from emotion_infer import load_tokenizer
 
 # 1) 이 파일이 있는 위치 기준으로 모델 폴더 경로
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,17 +11,13 @@ MODEL_DIR = os.path.join(BASE_DIR, "kobert_emotion_final")
 print("MODEL_DIR:", MODEL_DIR)
 print("FILES:", os.listdir(MODEL_DIR))
 
-# 2) 토크나이저는 HuggingFace에서 원본 monologg/kobert 사용
-tokenizer = AutoTokenizer.from_pretrained(
-    "monologg/kobert",
-    trust_remote_code=True,
-)
+# 2) 토크나이저는 모델 폴더에 있는 KoBERT 파일(vocab.txt, SentencePiece 모델)로 직접 생성
+tokenizer = load_tokenizer(MODEL_DIR)
 
 # 3) 모델은 네가 fine-tune 한 로컬 폴더에서 로드
 model = AutoModelForSequenceClassification.from_pretrained(
     MODEL_DIR,
     local_files_only=True,
-    trust_remote_code=True,
 )
 model.eval()
 
@@ -63,6 +61,20 @@ if __name__ == "__main__":
     for s in samples:
         print(s, "->", predict(s))
 
+    # 1-1) 배치 인코딩(batch_encode_fast)이 기존 토크나이저와 토큰 단위로 같은지 확인
+    parity_samples = samples + [
+        "1,000원이 두 번 결제됐어요",        # 숫자+, piece (느린 경로)
+        "[CLS] 특수 토큰이 들어간 문장",     # 특수 토큰 문자열 (느린 경로)
+        "☃ 사전에 없는 문자",                # unk piece (느린 경로)
+        "",
+        "아주 긴 문장 " * 100,               # truncation (126 + [CLS]/[SEP])
+    ]
+    expected = tokenizer(parity_samples, padding=True, truncation=True, max_length=128, return_tensors="np")
+    fast = tokenizer.batch_encode_fast(parity_samples, max_length=128, return_tensors="np")
+    for k in expected.keys():
+        assert (expected[k] == fast[k]).all(), f"batch_encode_fast 불일치: {k}"
+    print("\n=== batch_encode_fast parity OK ===")
+
     # 2) 발화 리스트(대화)로 테스트
     print("\n=== 발화별(고객 발화만) 감정 테스트 ===")
     conversation = [
@@ -0,0 +1,31 @@
+# worker_pool.py
+#
+# 배치 스크립트(lib/aihub_parallel)와 CallcenterAudioProcessor.process_many가 같이 쓰는
+# 멀티 프로세스 헬퍼: 워커별 스레드 예산과 spawn 프로세스 풀.
+import os
+import multiprocessing as mp
+
+
+def default_threads_per_worker(workers: int) -> int:
+    """코어를 워커 수로 나눈 스레드 예산 (워커끼리 코어를 뺏지 않도록)"""
+    return max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+
+def limit_threads(num_threads: int, torch_threads: bool = True):
+    """
+    워커 프로세스의 OpenMP / MKL (그리고 torch) 스레드 수를 num_threads로 제한.
+    torch import 전에 불러야 OpenMP / MKL 스레드 수에 반영된다.
+    """
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["MKL_NUM_THREADS"] = str(num_threads)
+
+    if torch_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+        torch.set_num_interop_threads(1)
+
+
+def spawn_pool(workers: int, initializer=None, initargs=()):
+    """spawn 방식 프로세스 풀 (fork 후 torch 스레드 풀이 꼬이지 않게)"""
+    ctx = mp.get_context("spawn")
+    return ctx.Pool(workers, initializer=initializer, initargs=initargs)